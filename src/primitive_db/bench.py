@@ -0,0 +1,182 @@
+import contextlib
+import csv
+import json
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:  # not on Windows: peak RSS is reported as null there
+    resource = None
+
+from src.primitive_db import engine, utils
+from src.primitive_db.decorators import CONFIRM
+
+BENCH_SIZES = (10_000, 100_000, 1_000_000)
+BENCH_SEED = 42
+POINT_OPS = 1000  # single-row inserts and point selects per size
+WRITE_OPS = 100  # updates and deletes per size
+SCAN_OPS = 5  # full-table scans per size
+BENCH_SCHEMA = "name:str age:int active:bool"
+
+
+def _peak_rss() -> int | None:
+    """Peak resident set size of this process in bytes."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _commit() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip()
+
+
+def _summary(latencies: list[float], rows: int | None = None) -> dict:
+    ordered = sorted(latencies)
+    total = sum(ordered)
+
+    def pct(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+    result = {
+        "ops": len(ordered),
+        "total_s": round(total, 6),
+        "ops_per_s": round(len(ordered) / total, 1) if total else None,
+        "p50_ms": round(pct(0.50), 3),
+        "p99_ms": round(pct(0.99), 3),
+    }
+    if rows is not None:
+        result["rows_per_s"] = round(rows / total, 1) if total else None
+    return result
+
+
+def _timed(statements: list[str]) -> list[float]:
+    """Run statements through the engine, return per-statement seconds."""
+    latencies: list[float] = []
+    for statement in statements:
+        start = time.perf_counter()
+        engine.execute_line(statement)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def _write_csv(path: str, size: int, rng: random.Random) -> None:
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["name", "age", "active"])
+        for i in range(size):
+            writer.writerow([f"user{i}", rng.randrange(100), rng.random() < 0.5])
+
+
+def bench_size(size: int, workdir: str) -> dict:
+    """Time every CRUD path on a fresh synthetic table of size rows."""
+    rng = random.Random(BENCH_SEED)
+    table = f"bench_{size}"
+    source = os.path.join(workdir, f"{table}.csv")
+    _write_csv(source, size, rng)
+
+    engine.execute_line(f"create_table {table} {BENCH_SCHEMA}")
+    results = {"bulk_load": _summary(_timed([f"load {table} from {source}"]), size)}
+
+    inserts = [
+        f'insert into {table} values ("new{i}", {rng.randrange(100)}, true)'
+        for i in range(POINT_OPS)
+    ]
+    results["insert"] = _summary(_timed(inserts))
+
+    last_id = size + POINT_OPS
+    point = [
+        f"select from {table} where ID = {rng.randint(1, last_id)}"
+        for _ in range(POINT_OPS)
+    ]
+    results["point_select"] = _summary(_timed(point))
+
+    # distinct bounds so the select cache never answers a scan
+    scans = [f"select from {table} where age > {98 - i}" for i in range(SCAN_OPS)]
+    results["full_scan"] = _summary(_timed(scans))
+
+    victims = rng.sample(range(1, last_id + 1), 2 * WRITE_OPS)
+    updates = [
+        f"update {table} set age = {rng.randrange(100)} where ID = {row_id}"
+        for row_id in victims[:WRITE_OPS]
+    ]
+    results["update"] = _summary(_timed(updates))
+    deletes = [
+        f"delete from {table} where ID = {row_id}" for row_id in victims[WRITE_OPS:]
+    ]
+    results["delete"] = _summary(_timed(deletes))
+
+    engine.execute_line(f"drop_table {table}")
+    engine.CATALOG.forget(table)
+    results["peak_rss_bytes"] = _peak_rss()
+    return results
+
+
+def _bench_process(size: int, workdir: str, storage: str) -> dict:
+    """
+    bench_size in a process of its own (see run_bench), so its peak RSS
+    belongs to this size alone rather than to every size run before it.
+    """
+    CONFIRM["assume_yes"] = True
+    os.chdir(workdir)
+    utils.set_storage_backend(storage)
+    engine.configure()
+    utils.recover_storage()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        try:
+            return bench_size(size, workdir)
+        finally:
+            engine.shutdown()
+
+
+def run_bench(sizes=BENCH_SIZES, out_path: str | None = None) -> dict:
+    """
+    Run the suite in a scratch directory (so the real database is never
+    touched) and write the JSON report to out_path or stdout. Each size runs
+    in a fresh process: ru_maxrss is a high-water mark of the whole process.
+    """
+    report = {
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "storage": utils.STORAGE_BACKEND,
+        "seed": BENCH_SEED,
+        "sizes": {},
+    }
+    workdir = tempfile.mkdtemp(prefix="primitive_db_bench_")
+    context = multiprocessing.get_context("spawn")
+    try:
+        for size in sizes:
+            with ProcessPoolExecutor(1, mp_context=context) as pool:
+                task = pool.submit(_bench_process, size, workdir, utils.STORAGE_BACKEND)
+                report["sizes"][str(size)] = task.result()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if out_path is None:
+        print(text)
+    else:
+        with open(out_path, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    return report
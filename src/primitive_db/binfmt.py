@@ -0,0 +1,225 @@
+import json
+import mmap
+import struct
+import sys
+from array import array
+from bisect import bisect_right
+
+MAGIC = b"PDB1"
+_HEADER = struct.Struct("=4sIQ")  # magic, header json length, row count
+_INT_MIN, _INT_MAX = -(2**63), 2**63 - 1
+
+
+def _column_type(values: list) -> str:
+    if all(type(v) is bool for v in values):
+        return "bool"
+    if all(type(v) is int and _INT_MIN <= v <= _INT_MAX for v in values):
+        return "int"
+    if all(type(v) is str for v in values):
+        return "str"
+    return "json"
+
+
+def _heap(strings: list[str]) -> tuple[bytes, bytes]:
+    offsets = array("Q", [0])
+    chunks: list[bytes] = []
+    pos = 0
+    for s in strings:
+        b = s.encode("utf-8")
+        chunks.append(b)
+        pos += len(b)
+        offsets.append(pos)
+    return offsets.tobytes(), b"".join(chunks)
+
+
+def encode_table(rows: list[dict]) -> bytes:
+    """
+    Encode rows into the binary table format:
+    fixed header | header json (columns, section offsets) | column sections.
+    int/bool columns are fixed-width arrays; str columns are an offsets
+    array (row_count + 1 entries) followed by a UTF-8 heap.
+    """
+    names = list(dict.fromkeys(name for row in rows for name in row))
+    sections: list[bytes] = []
+    columns: list[dict] = []
+    for name in names:
+        values = [row.get(name) for row in rows]
+        typ = _column_type(values)
+        if typ == "int":
+            sections.append(array("q", values).tobytes())
+        elif typ == "bool":
+            sections.append(array("b", values).tobytes())
+        else:
+            if typ == "json":
+                values = [json.dumps(v, ensure_ascii=False) for v in values]
+            offsets, heap = _heap(values)
+            sections.append(offsets + heap)
+        columns.append({"name": name, "type": typ, "size": len(sections[-1])})
+
+    # the highest ID is kept in the header, so ID allocation need not read rows
+    top_id = max((row["ID"] for row in rows if "ID" in row), default=0)
+    header = {"byteorder": sys.byteorder, "columns": columns, "top_id": top_id}
+    # section offsets depend on the header length and vice versa;
+    # offsets only grow with head_len, so this settles in a few rounds
+    head_len = 0
+    while True:
+        pos = _HEADER.size + head_len
+        pos += -pos % 8
+        for col in columns:
+            col["offset"] = pos
+            pos += col["size"]
+            pos += -pos % 8
+        head_json = json.dumps(header).encode("utf-8")
+        if len(head_json) == head_len:
+            break
+        head_len = len(head_json)
+
+    out = bytearray(_HEADER.pack(MAGIC, head_len, len(rows)))
+    out += head_json
+    for col, section in zip(columns, sections):
+        out += b"\0" * (col["offset"] - len(out))
+        out += section
+    return bytes(out)
+
+
+class BinaryTable:
+    """Memory-mapped reader over a binary table file."""
+
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as f:
+            if f.seek(0, 2) < _HEADER.size:
+                raise ValueError(f"Некорректное значение: {path}. Попробуйте снова.")
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, head_len, self.row_count = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Некорректное значение: {path}. Попробуйте снова.")
+        header = json.loads(self._mm[_HEADER.size : _HEADER.size + head_len])
+        if header["byteorder"] != sys.byteorder:
+            raise ValueError(f"Некорректное значение: {path}. Попробуйте снова.")
+        self.columns = {c["name"]: c for c in header["columns"]}
+        self.top_id: int | None = header.get("top_id")
+
+    def close(self) -> None:
+        self._mm.close()
+
+    def __enter__(self) -> "BinaryTable":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _fixed(self, col: dict) -> memoryview:
+        code = "q" if col["type"] == "int" else "b"
+        width = 8 if code == "q" else 1
+        start = col["offset"]
+        return memoryview(self._mm)[start : start + width * self.row_count].cast(code)
+
+    def _offsets(self, col: dict) -> memoryview:
+        start = col["offset"]
+        end = start + 8 * (self.row_count + 1)
+        return memoryview(self._mm)[start:end].cast("Q")
+
+    def _column(self, col: dict, positions=None) -> list:
+        """
+        Values of a column at positions (all if None), decoded in one pass:
+        a whole column is copied out with array.frombytes / one heap slice,
+        a few positions are read through a single cast of the section.
+        """
+        typ = col["type"]
+        start = col["offset"]
+        if typ in ("int", "bool"):
+            if positions is None:
+                values = array("q" if typ == "int" else "b")
+                end = start + values.itemsize * self.row_count
+                values.frombytes(self._mm[start:end])
+                values = values.tolist()
+            else:
+                fixed = self._fixed(col)
+                values = [fixed[i] for i in positions]
+            return list(map(bool, values)) if typ == "bool" else values
+
+        heap = start + 8 * (self.row_count + 1)
+        if positions is None:
+            offsets = array("Q")
+            offsets.frombytes(self._mm[start:heap])
+            raw = self._mm[heap : heap + offsets[-1]]
+            text = raw.decode("utf-8")
+            if len(text) == len(raw):
+                # ASCII: byte offsets are character offsets
+                values = [text[a:b] for a, b in zip(offsets, offsets[1:])]
+            else:
+                values = [
+                    raw[a:b].decode("utf-8") for a, b in zip(offsets, offsets[1:])
+                ]
+        else:
+            offsets = self._offsets(col)
+            mm = self._mm
+            values = [
+                mm[heap + offsets[i] : heap + offsets[i + 1]].decode("utf-8")
+                for i in positions
+            ]
+        if typ == "json":
+            # each value is a JSON text: parse them all as one array
+            return json.loads("[" + ",".join(values) + "]")
+        return values
+
+    def read_rows(self, positions=None) -> list[dict]:
+        """Materialize rows at given positions (all rows if None)."""
+        if positions is not None:
+            positions = list(positions)
+        names = list(self.columns)
+        values = [self._column(c, positions) for c in self.columns.values()]
+        return [dict(zip(names, row)) for row in zip(*values)]
+
+    def find_eq(self, name: str, val) -> list[int]:
+        """
+        Positions of rows where column == val, found with mmap.find over
+        the raw section bytes rather than by decoding every value.
+        """
+        col = self.columns[name]
+        typ = col["type"]
+        if typ in ("int", "bool"):
+            if type(val) is not (bool if typ == "bool" else int):
+                return []
+            if typ == "int" and not _INT_MIN <= val <= _INT_MAX:
+                return []
+            width = 8 if typ == "int" else 1
+            needle = array("q" if typ == "int" else "b", [val]).tobytes()
+            return self._find_fixed(col["offset"], width, needle)
+
+        if typ == "json":
+            return [i for i, v in enumerate(self._column(col)) if v == val]
+        if type(val) is not str:
+            return []
+        return self._find_str(col, val.encode("utf-8"))
+
+    def _find_fixed(self, start: int, width: int, needle: bytes) -> list[int]:
+        end = start + width * self.row_count
+        found: list[int] = []
+        pos = self._mm.find(needle, start, end)
+        while pos != -1:
+            i, rem = divmod(pos - start, width)
+            if rem == 0:
+                found.append(i)
+            # any earlier match would have been found first, so resume at
+            # the next element boundary
+            pos = self._mm.find(needle, start + (i + 1) * width, end)
+        return found
+
+    def _find_str(self, col: dict, needle: bytes) -> list[int]:
+        offsets = self._offsets(col)
+        heap = col["offset"] + 8 * (self.row_count + 1)
+        end = heap + offsets[self.row_count]
+        if not needle:
+            return [i for i in range(self.row_count) if offsets[i] == offsets[i + 1]]
+
+        found: list[int] = []
+        pos = self._mm.find(needle, heap, end)
+        while pos != -1:
+            rel = pos - heap
+            i = bisect_right(offsets, rel) - 1
+            if offsets[i] == rel and offsets[i + 1] == rel + len(needle):
+                found.append(i)
+            pos = self._mm.find(needle, heap + offsets[i + 1], end)
+        return found
@@ -0,0 +1,321 @@
+import os
+import time
+from contextlib import ExitStack
+
+from src.primitive_db.columnar import ColumnarTable
+from src.primitive_db.core import as_condition
+from src.primitive_db.metrics import timed
+from src.primitive_db.rows import compact_rows
+from src.primitive_db.utils import (
+    append_batch,
+    append_delete,
+    append_insert,
+    append_insert_many,
+    append_update,
+    bump_version,
+    create_index,
+    get_storage,
+    keep_last_id,
+    load_indexes,
+    load_metadata,
+    load_table_data,
+    save_metadata,
+    save_table_data,
+    select_eq,
+    table_lock,
+    table_seq,
+)
+
+_APPENDS = {
+    "insert": append_insert,
+    "insert_many": append_insert_many,
+    "update": append_update,
+    "delete": append_delete,
+}
+
+
+def _mtime(path: str) -> tuple[int, int]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return (0, 0)
+    return (st.st_mtime_ns, st.st_size)
+
+
+class Catalog:
+    """
+    Session cache of metadata, table rows and indexes.
+    Tables stay resident after first load and are re-read only when their
+    on-disk stamp changes (another process wrote them). With
+    flush_interval == 0 every change is written through immediately;
+    otherwise changed tables are marked dirty and saved by flush().
+    Between begin() and commit() every change is deferred that way and
+    the dirty tables are the transaction's write set.
+    """
+
+    def __init__(self,
+                 meta_file: str,
+                 flush_interval: float = 0.0,
+                 columnar_min_rows: int | None = None,
+    ) -> None:
+        self.meta_file = meta_file
+        self.flush_interval = flush_interval
+        self.columnar_min_rows = columnar_min_rows
+        self._meta: dict | None = None
+        self._meta_stamp: tuple[int, int] = (0, 0)
+        self._tables: dict[str, list[dict]] = {}
+        self._indexes: dict[str, dict] = {}
+        self._columnar: dict[str, ColumnarTable] = {}
+        self._stamps: dict[str, list[int]] = {}
+        # header "seq" of resident tables, read once per load
+        self._seqs: dict[str, int] = {}
+        self._dirty: set[str] = set()
+        self._last_flush = time.monotonic()
+        self._transaction = False
+        # per table: (op, args) of each change since begin(), see append_batch
+        self._pending: dict[str, list[tuple]] = {}
+
+    # ---------- metadata ----------
+    def metadata(self) -> dict:
+        stamp = _mtime(self.meta_file)
+        if self._meta is None or stamp != self._meta_stamp:
+            self._meta = load_metadata(self.meta_file)
+            self._meta_stamp = stamp
+        return self._meta
+
+    def metadata_version(self) -> tuple[int, int]:
+        """Changes whenever db_meta.json is rewritten (plans depend on it)."""
+        self.metadata()
+        return self._meta_stamp
+
+    def save_metadata(self, metadata: dict) -> None:
+        save_metadata(self.meta_file, metadata)
+        self._meta = metadata
+        self._meta_stamp = _mtime(self.meta_file)
+
+    # ---------- tables ----------
+    def table(self, table_name: str) -> list[dict]:
+        stamp = get_storage().stamp(table_name)
+        cached = table_name in self._tables
+        if not cached or (
+            table_name not in self._dirty and stamp != self._stamps[table_name]
+        ):
+            with timed("phase_seconds", phase="load", table=table_name):
+                self._tables[table_name] = self._load(table_name)
+            self._indexes.pop(table_name, None)
+            self._columnar.pop(table_name, None)
+            self._seqs.pop(table_name, None)
+            self._stamps[table_name] = stamp
+        return self._tables[table_name]
+
+    def _load(self, table_name: str) -> list:
+        """Table rows from storage as compact rows of the table's schema."""
+        table_data = load_table_data(table_name)
+        schema = self.metadata().get(table_name)
+        if schema is None:
+            return table_data
+        return compact_rows(schema, table_data)
+
+    def resident(self, table_name: str) -> bool:
+        """Whether the table is already held in memory."""
+        return table_name in self._tables
+
+    def cold_select(self,
+                    table_name: str,
+                    where_clause: dict | tuple | None
+    ) -> list | None:
+        """
+        Answer col = val on a table that is not resident yet directly from
+        storage (memory-mapped binary snapshot), without loading it.
+        """
+        if where_clause is None or table_name in self._tables:
+            return None
+        condition = as_condition(where_clause)
+        if len(condition) != 3 or condition[1] != "=":
+            return None
+        col, _, val = condition
+        return select_eq(table_name, col, val)
+
+    def indexes(self, table_name: str) -> dict:
+        table_data = self.table(table_name)
+        if table_name not in self._indexes:
+            with timed("phase_seconds", phase="load", table=table_name):
+                self._indexes[table_name] = load_indexes(table_name, table_data)
+        return self._indexes[table_name]
+
+    def columnar(self, table_name: str, schema: list[dict]) -> ColumnarTable | None:
+        """
+        Columnar copy of the table for scans, built lazily for tables with
+        at least columnar_min_rows rows and then kept up to date by writes.
+        """
+        table_data = self.table(table_name)
+        if self.columnar_min_rows is None or len(table_data) < self.columnar_min_rows:
+            return None
+        if table_name not in self._columnar:
+            self._columnar[table_name] = ColumnarTable(schema, table_data)
+        return self._columnar[table_name]
+
+    def create_index(self, table_name: str, col: str, kind: str = "hash") -> None:
+        index = create_index(table_name, col, self.table(table_name), kind)
+        self.indexes(table_name)[col] = index
+
+    def last_id(self, table_name: str) -> int:
+        """
+        Highest ID the table has handed out: its last row (rows are kept
+        in ID order) or the header "seq" once that row is deleted.
+        """
+        table_data = self.table(table_name)
+        if table_name not in self._seqs:
+            self._seqs[table_name] = table_seq(table_name)
+        top = table_data[-1]["ID"] if table_data else 0
+        return max(self._seqs[table_name], top)
+
+    def next_ids(self, table_name: str, count: int) -> range:
+        """
+        Allocate count consecutive IDs after last_id(). Nothing is written:
+        the inserted rows themselves carry the sequence forward.
+        """
+        last = self.last_id(table_name)
+        return range(last + 1, last + count + 1)
+
+    def keep_last_id(self, table_name: str, row_id: int) -> None:
+        """Keep row_id from being handed out again (see utils.keep_last_id)."""
+        keep_last_id(table_name, row_id)
+        if table_name in self._seqs:
+            self._seqs[table_name] = max(self._seqs[table_name], row_id)
+
+    def forget(self, table_name: str) -> None:
+        """Drop a table from the session cache (e.g. after drop_table)."""
+        stores = (self._tables, self._indexes, self._columnar, self._stamps, self._seqs)
+        for store in stores:
+            store.pop(table_name, None)
+        self._dirty.discard(table_name)
+
+    # ---------- writes ----------
+    def _written(self, table_name: str) -> None:
+        self._stamps[table_name] = get_storage().stamp(table_name)
+
+    def _defer(self, table_name: str) -> bool:
+        if self.flush_interval <= 0 and not self._transaction:
+            return False
+        self._dirty.add(table_name)
+        bump_version(table_name)
+        return True
+
+    def _record(self, table_name: str, op: str, *args) -> None:
+        """
+        Write a change through, or keep it for flush() / commit(). In a
+        transaction the change itself is kept too, to be appended at commit.
+        """
+        if self._defer(table_name):
+            if self._transaction:
+                self._pending.setdefault(table_name, []).append((op, args))
+            return
+        with timed("phase_seconds", phase="save", table=table_name):
+            _APPENDS[op](table_name, *args)
+        self._written(table_name)
+
+    def _patch_columnar(self, table_name: str, change: str, *args) -> None:
+        """Apply a write to the table's columnar copy, if one is built."""
+        columns = self._columnar.get(table_name)
+        if columns is not None:
+            getattr(columns, change)(*args)
+
+    def record_insert(self, table_name: str, row: dict) -> None:
+        self._patch_columnar(table_name, "append", [row])
+        self._record(table_name, "insert", row)
+
+    def record_insert_many(self, table_name: str, rows: list[dict]) -> None:
+        self._patch_columnar(table_name, "append", rows)
+        self._record(table_name, "insert_many", rows)
+
+    def record_update(self, table_name: str, ids: list[int], changes: dict) -> None:
+        self._patch_columnar(table_name, "update", ids, changes)
+        self._record(table_name, "update", ids, changes)
+
+    def record_delete(self,
+                      table_name: str,
+                      ids: list[int],
+                      new_data: list[dict]
+    ) -> None:
+        self._tables[table_name] = new_data
+        self._patch_columnar(table_name, "delete", ids)
+        self._record(table_name, "delete", ids)
+
+    def dirty(self) -> set[str]:
+        return set(self._dirty)
+
+    def flush(self) -> None:
+        """Save all dirty tables (inside a transaction: not before commit)."""
+        if self._transaction:
+            return
+        for table_name in sorted(self._dirty):
+            with table_lock(table_name, exclusive=True), timed(
+                "phase_seconds", phase="save", table=table_name
+            ):
+                save_table_data(table_name, self._tables[table_name])
+            self._written(table_name)
+        self._dirty.clear()
+        self._last_flush = time.monotonic()
+
+    # ---------- transactions ----------
+    def in_transaction(self) -> bool:
+        return self._transaction
+
+    def begin(self) -> None:
+        """Start a transaction: from now on writes stay in memory."""
+        self.flush()
+        self._transaction = True
+
+    def commit(self) -> int:
+        """
+        Save every table written in the transaction, holding all their locks
+        together: each table gets the transaction's changes as one batch,
+        which storage applies entirely or not at all. If another process
+        wrote one of them since it was loaded, or a save fails, the
+        transaction is rolled back and ValueError is raised (tables saved
+        before the failure keep their batch). Returns the number of tables.
+        """
+        tables = sorted(self._dirty)
+        with ExitStack() as stack:
+            for table_name in tables:
+                stack.enter_context(table_lock(table_name, exclusive=True))
+            for table_name in tables:
+                if get_storage().stamp(table_name) != self._stamps[table_name]:
+                    self.rollback()
+                    raise ValueError(
+                        f'Ошибка: Таблица "{table_name}" изменена другим '
+                        "процессом, транзакция отменена."
+                    )
+            for table_name in tables:
+                try:
+                    with timed("phase_seconds", phase="save", table=table_name):
+                        append_batch(table_name, self._pending.get(table_name, []))
+                except OSError as e:
+                    # memory is re-read from storage, which is consistent
+                    self.rollback()
+                    raise ValueError(
+                        f'Ошибка: Не удалось сохранить таблицу "{table_name}" '
+                        f"({e}), транзакция отменена."
+                    ) from e
+                self._written(table_name)
+                self._dirty.discard(table_name)
+                self._pending.pop(table_name, None)
+            self._transaction = False
+        return len(tables)
+
+    def rollback(self) -> None:
+        """
+        End the transaction without saving: its tables are dropped from
+        memory and re-read from storage, which still has the committed rows.
+        """
+        for table_name in sorted(self._dirty):
+            self.forget(table_name)
+            bump_version(table_name)
+        self._pending.clear()
+        self._transaction = False
+
+    def maybe_flush(self) -> None:
+        """Flush if flush_interval has elapsed since the last flush."""
+        if self._dirty and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
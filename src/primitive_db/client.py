@@ -0,0 +1,31 @@
+import json
+import socket
+
+import prompt
+
+from src.primitive_db.server import DEFAULT_HOST, DEFAULT_PORT
+
+
+def run_client(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> None:
+    """Interactive client for the serve mode: same commands as the REPL."""
+    try:
+        sock = socket.create_connection((host, port))
+    except OSError as e:
+        print(f"Ошибка: не удалось подключиться к {host}:{port} ({e}).")
+        return
+
+    with sock, sock.makefile("rwb") as conn:
+        print(f"Подключено к {host}:{port}. Для выхода введите exit.")
+        while True:
+            line = prompt.string(">>>Введите команду: ").strip()
+            if not line:
+                continue
+            conn.write(line.encode("utf-8") + b"\n")
+            conn.flush()
+            if line == "exit":
+                return
+            reply = conn.readline()
+            if not reply:
+                print("Ошибка: соединение с сервером закрыто.")
+                return
+            print(json.loads(reply)["output"], end="")
@@ -0,0 +1,209 @@
+import operator
+from array import array
+from collections.abc import Callable, Mapping
+from functools import partial, reduce
+from itertools import compress
+
+from src.primitive_db.rows import column_values
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, stdlib arrays are used without it
+    np = None
+
+_TYPECODES = {"int": "q", "bool": "b"}
+_INT_MIN, _INT_MAX = -(2**63), 2**63 - 1
+# op(val, v) tests "v <op> val" with the value on the right
+_FLIPPED = {
+    "=": operator.eq,
+    "<": operator.gt,
+    "<=": operator.ge,
+    ">": operator.lt,
+    ">=": operator.le,
+}
+
+
+class ColumnarTable:
+    """
+    Columnar copy of a table for fast WHERE scans, kept in step with the
+    table's writes by append/update/delete. It is held next to the row
+    list, not instead of it. int/bool columns are typed arrays, str columns
+    are dictionary-encoded: each distinct string is stored once and rows
+    hold an int code.
+    """
+
+    def __init__(self, schema: list[dict], table_data: list[dict]) -> None:
+        self.size = len(table_data)
+        self.columns: dict[str, array | list] = {}
+        self.dictionaries: dict[str, dict[str, int]] = {}
+        self._positions: dict[int, int] | None = None  # ID -> row position
+
+        for c in schema:
+            name, typ = c["name"], c["type"]
+            values = column_values(table_data, name)
+            if typ == "str":
+                codes: dict[str, int] = {}
+                self.dictionaries[name] = codes
+                encoded = [codes.setdefault(v, len(codes)) for v in values]
+                self.columns[name] = array("l", encoded)
+            elif typ in _TYPECODES:
+                try:
+                    self.columns[name] = array(_TYPECODES[typ], values)
+                except (OverflowError, TypeError):
+                    # out-of-range ints or missing values: keep as plain list
+                    self.columns[name] = values
+            else:
+                self.columns[name] = values
+
+    def __len__(self) -> int:
+        return self.size
+
+    def append(self, rows: list[Mapping]) -> None:
+        """Add rows appended to the end of the table."""
+        for name, column in self.columns.items():
+            values = column_values(rows, name)
+            codes = self.dictionaries.get(name)
+            if codes is not None:
+                values = [codes.setdefault(v, len(codes)) for v in values]
+            if isinstance(column, array):
+                try:
+                    column.extend(array(column.typecode, values))
+                    continue
+                except (OverflowError, TypeError):
+                    column = self.columns[name] = column.tolist()
+            column.extend(values)
+        if self._positions is not None:
+            for i, row_id in enumerate(column_values(rows, "ID"), self.size):
+                self._positions[row_id] = i
+        self.size += len(rows)
+
+    def update(self, ids: list[int], changes: dict) -> None:
+        """Set changes {column: value} in the rows with these IDs."""
+        positions = self._locate(ids)
+        for name, value in changes.items():
+            codes = self.dictionaries.get(name)
+            if codes is not None:
+                value = codes.setdefault(value, len(codes))
+            column = self.columns[name]
+            try:
+                for p in positions:
+                    column[p] = value
+            except (OverflowError, TypeError):
+                column = self.columns[name] = column.tolist()
+                for p in positions:
+                    column[p] = value
+
+    def delete(self, ids: list[int]) -> None:
+        """Drop the rows with these IDs; the rest keep their order."""
+        keep = bytearray(b"\x01") * self.size
+        for p in self._locate(ids):
+            keep[p] = 0
+        for name, column in self.columns.items():
+            kept = compress(column, keep)
+            if isinstance(column, array):
+                self.columns[name] = array(column.typecode, kept)
+            else:
+                self.columns[name] = list(kept)
+        self.size -= len(ids)
+        self._positions = None
+
+    def _locate(self, ids: list[int]) -> list[int]:
+        if self._positions is None:
+            self._positions = dict(zip(self.columns["ID"], range(self.size)))
+        return [self._positions[row_id] for row_id in ids]
+
+    def filter(self,
+               where: tuple,
+               matcher: Callable[[str, object], Callable[[object], bool]],
+    ) -> list[int] | None:
+        """
+        Positions of rows matching a condition tree (see core.as_condition),
+        or None if a leaf is on a column that is not a typed array or a
+        dictionary. Each leaf becomes one boolean mask (numpy when it is
+        installed, else 0/1 bytes) and and/or/not combine whole masks.
+        matcher(op, val) is the per-value test, used on dictionary strings.
+        """
+        mask = self._mask(where, matcher)
+        if mask is None:
+            return None
+        if np is not None:
+            return np.flatnonzero(mask).tolist()
+        if mask.count(1) > self.size // 16:
+            return list(compress(range(self.size), mask))
+        # few matches: jump between them with C-level searches
+        positions: list[int] = []
+        find = mask.find
+        p = find(1)
+        while p != -1:
+            positions.append(p)
+            p = find(1, p + 1)
+        return positions
+
+    def _mask(self, node: dict | tuple, matcher: Callable):
+        if isinstance(node, dict):
+            (col, val), = node.items()
+            node = (col, "=", val)
+        if len(node) == 3:
+            return self._leaf_mask(*node, matcher)
+        kind, arg = node
+        if kind == "not":
+            inner = self._mask(arg, matcher)
+            return None if inner is None else _mask_not(inner)
+        masks = [self._mask(part, matcher) for part in arg]
+        if any(mask is None for mask in masks):
+            return None
+        return reduce(_mask_and if kind == "and" else _mask_or, masks)
+
+    def _leaf_mask(self, col: str, op: str, val, matcher: Callable):
+        column = self.columns.get(col)
+        if not isinstance(column, array):
+            return None
+        codes = self.dictionaries.get(col)
+        if codes is not None:
+            # test each distinct string once, then pick rows by code
+            match = matcher(op, val)
+            return _in_mask(column, [code for v, code in codes.items() if match(v)])
+        if op == "between":
+            low = self._leaf_mask(col, ">=", val[0], matcher)
+            high = self._leaf_mask(col, "<=", val[1], matcher)
+            return None if low is None or high is None else _mask_and(low, high)
+        values = val if op == "in" else (val,)
+        if not all(type(v) in (int, bool) for v in values):
+            return None
+        if not all(_INT_MIN <= v <= _INT_MAX for v in values):
+            return None
+        if op == "in":
+            return _in_mask(column, values)
+        if np is not None:
+            return _FLIPPED[op](val, np.frombuffer(column, dtype=column.typecode))
+        return bytes(map(partial(_FLIPPED[op], val), column))
+
+
+def _in_mask(column: array, values):
+    if np is not None:
+        return np.isin(np.frombuffer(column, dtype=column.typecode), list(values))
+    return bytes(map(frozenset(values).__contains__, column))
+
+
+# without numpy masks are bytes of 0/1: combined as big ints, byte by byte
+def _mask_and(a, b):
+    if np is not None:
+        return a & b
+    return (int.from_bytes(a, "little") & int.from_bytes(b, "little")).to_bytes(
+        len(a), "little"
+    )
+
+
+def _mask_or(a, b):
+    if np is not None:
+        return a | b
+    return (int.from_bytes(a, "little") | int.from_bytes(b, "little")).to_bytes(
+        len(a), "little"
+    )
+
+
+def _mask_not(a):
+    if np is not None:
+        return ~a
+    ones = int.from_bytes(b"\x01" * len(a), "little")
+    return (int.from_bytes(a, "little") ^ ones).to_bytes(len(a), "little")
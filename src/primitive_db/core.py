@@ -1,5 +1,25 @@
+import heapq
+from collections.abc import Callable, Iterable, Iterator
+from functools import reduce
+from itertools import islice
+
+from src.primitive_db.columnar import ColumnarTable
+from src.primitive_db.decorators import confirm_action
+from src.primitive_db.indexes import (
+    SortedIndex,
+    id_range,
+    index_add,
+    index_remove,
+    locate_rows,
+)
+from src.primitive_db.parallel import ScanPool
+from src.primitive_db.rows import column_values, row_type
+
 VALID_TYPES = {"int", "str", "bool"}
 ID_COL = ("ID", "int")
+COMPARE_OPS = {"=", "<", "<=", ">", ">=", "between", "in"}
+# deleting more rows than this by position is slower than one rebuild pass
+_POP_LIMIT = 64
 
 
 def cast_value(raw: str, expected_type: str):
@@ -28,6 +48,276 @@ def _schema_map(schema: list[dict]) -> dict[str, str]:
     return {c["name"]: c["type"] for c in schema}
 
 
+def as_condition(where_clause: dict | tuple) -> tuple:
+    """
+    Normalize a typed where clause to a condition tree. Leaves are
+    (col, op, value): for "between" value is a (low, high) pair, for "in"
+    a tuple of values. Nodes are ("and" | "or", (children, ...)) and
+    ("not", child). {col: val} is shorthand for (col, "=", val).
+    """
+    if isinstance(where_clause, dict):
+        (col, val), = where_clause.items()
+        return col, "=", val
+    return where_clause
+
+
+def _matcher(op: str, val) -> Callable[[object], bool]:
+    if op == "=":
+        return lambda v: v == val
+    if op == "in":
+        values = frozenset(val)
+        return lambda v: v in values
+    if op == "between":
+        low, high = val
+        return lambda v: v is not None and low <= v <= high
+    if op == "<":
+        return lambda v: v is not None and v < val
+    if op == "<=":
+        return lambda v: v is not None and v <= val
+    if op == ">":
+        return lambda v: v is not None and v > val
+    if op == ">=":
+        return lambda v: v is not None and v >= val
+    raise ValueError(f"Некорректное значение: {op}. Попробуйте снова.")
+
+
+def where_columns(where_clause: dict | tuple) -> set[str]:
+    """All columns a where clause refers to."""
+    node = as_condition(where_clause)
+    if len(node) == 3:
+        return {node[0]}
+    kind, arg = node
+    parts = [arg] if kind == "not" else arg
+    return set().union(*(where_columns(part) for part in parts))
+
+
+def map_conditions(where_clause: dict | tuple, fn: Callable[[tuple], tuple]) -> tuple:
+    """Copy of a where clause with every (col, op, value) leaf replaced by fn(leaf)."""
+    node = as_condition(where_clause)
+    if len(node) == 3:
+        return fn(node)
+    kind, arg = node
+    if kind == "not":
+        return kind, map_conditions(arg, fn)
+    return kind, tuple(map_conditions(part, fn) for part in arg)
+
+
+def _both(a: Callable, b: Callable) -> Callable[[dict], bool]:
+    return lambda row: a(row) and b(row)
+
+
+def _either(a: Callable, b: Callable) -> Callable[[dict], bool]:
+    return lambda row: a(row) or b(row)
+
+
+def compile_predicate(where_clause: dict | tuple) -> Callable[[dict], bool]:
+    """
+    Compile a where clause into one closure over a row. AND and OR
+    evaluate left to right and stop at the first decisive child.
+    """
+    node = as_condition(where_clause)
+    if len(node) == 3:
+        col, op, val = node
+        match = _matcher(op, val)
+        return lambda row: match(row.get(col))
+    kind, arg = node
+    if kind == "not":
+        inner = compile_predicate(arg)
+        return lambda row: not inner(row)
+    return reduce(_both if kind == "and" else _either, map(compile_predicate, arg))
+
+
+def _bounds(op: str, val) -> tuple:
+    """(low, low_incl, high, high_incl) for a range operator."""
+    if op == "between":
+        return val[0], True, val[1], True
+    if op in ("<", "<="):
+        return None, True, val, op == "<="
+    return val, op == ">=", None, True
+
+
+def _candidates(table_data: list[dict],
+                col: str,
+                op: str,
+                val,
+                indexes: dict | None,
+) -> list[int] | None:
+    """Positions of rows that may match, or None for full scan."""
+    index = (indexes or {}).get(col)
+    if op in ("=", "in"):
+        values = val if op == "in" else (val,)
+        if index is not None:
+            ids = {row_id for v in values for row_id in index.get(v, [])}
+        elif col == "ID":
+            ids = set(values)
+        else:
+            return None
+        return locate_rows(table_data, sorted(ids))
+
+    if col == "ID":
+        return list(id_range(table_data, *_bounds(op, val)))
+    if isinstance(index, SortedIndex):
+        return locate_rows(table_data, sorted(index.range(*_bounds(op, val))))
+    return None
+
+
+def where_candidates(table_data: list[dict],
+                     where_clause: dict | tuple,
+                     indexes: dict | None,
+) -> list[int] | None:
+    """
+    Positions of rows that may match a where clause, or None for full
+    scan: index candidates of AND children are intersected, of OR
+    children united (only if every child has some).
+    """
+    node = as_condition(where_clause)
+    if len(node) == 3:
+        return _candidates(table_data, *node, indexes)
+    kind, arg = node
+    if kind == "not":
+        return None
+    found = [where_candidates(table_data, part, indexes) for part in arg]
+    if kind == "or":
+        if any(positions is None for positions in found):
+            return None
+        return sorted(set().union(*found))
+    found = sorted((f for f in found if f is not None), key=len)
+    if not found:
+        return None
+    result = found[0]
+    for other in found[1:]:
+        keep = set(other)
+        result = [p for p in result if p in keep]
+    return result
+
+
+def _scan_segment(values, offset: int, where: tuple, cols: list | None) -> list[int]:
+    # runs in a pool worker: the predicate is built here, not pickled
+    if cols is None:
+        # values of the single condition column
+        col, op, val = where
+        match = _matcher(op, val)
+        return [offset + i for i, v in enumerate(values) if match(v)]
+    match = compile_predicate(where)
+    return [offset + i for i, v in enumerate(values) if match(dict(zip(cols, v)))]
+
+
+def _scan(table_data: list[dict],
+          where: tuple,
+          pool: ScanPool | None,
+          columns: ColumnarTable | None = None,
+) -> list[int] | None:
+    """Positions of matching rows computed on the process pool, or None."""
+    if pool is None:
+        return None
+    bounds = pool.segments(len(table_data))
+    if bounds is None:
+        return None
+    cols = None if len(where) == 3 else sorted(where_columns(where))
+    column = None
+    if (
+        cols is None
+        and columns is not None
+        and where[0] not in columns.dictionaries
+        and len(columns) == len(table_data)
+    ):
+        # typed arrays pickle as raw bytes, much cheaper than a list
+        column = columns.columns.get(where[0])
+    tasks = []
+    for start, end in bounds:
+        if column is not None:
+            values = column[start:end]
+        elif cols is None:
+            values = column_values(table_data[start:end], where[0])
+        else:
+            # only the referenced columns travel to the workers
+            part = table_data[start:end]
+            values = list(zip(*(column_values(part, c) for c in cols)))
+        tasks.append((values, start, where, cols))
+    return [p for part in pool.map(_scan_segment, tasks) for p in part]
+
+
+def _where_rows(table_data: list[dict],
+                where: tuple,
+                indexes: dict | None,
+                columns: ColumnarTable | None,
+                pool: ScanPool | None,
+) -> tuple[list[int] | None, Callable[[dict], bool]]:
+    """
+    (candidate positions or None for every row, predicate) of a clause:
+    from indexes, else from masks over the columnar copy, else from a
+    parallel scan.
+    """
+    positions = where_candidates(table_data, where, indexes)
+    if positions is None and columns is not None and len(columns) == len(table_data):
+        positions = columns.filter(where, _matcher)
+    if positions is None:
+        positions = _scan(table_data, where, pool, columns)
+    return positions, compile_predicate(where)
+
+
+def _sort_key(col: str) -> Callable[[dict], tuple]:
+    # None sorts last instead of failing to compare
+    return lambda row: (row.get(col) is None, row.get(col))
+
+
+def _in_index_order(table_data: list[dict],
+                    col: str,
+                    descending: bool,
+                    indexes: dict | None,
+):
+    """Iterate rows in col order without sorting, or None if no index."""
+    if col == "ID":
+        return reversed(table_data) if descending else iter(table_data)
+    index = (indexes or {}).get(col)
+    if not isinstance(index, SortedIndex):
+        return None
+
+    def rows():
+        for row_id in index.ids(descending):
+            for pos in locate_rows(table_data, [row_id]):
+                yield table_data[pos]
+
+    return rows()
+
+
+def order_rows(rows: Iterable[dict],
+               order_by: tuple[str, bool] | None,
+               limit: int | None = None,
+) -> list[dict]:
+    """Sort rows by (col, descending) and apply limit; top-N uses a heap."""
+    if order_by is None:
+        return list(islice(rows, limit))
+    col, descending = order_by
+    key = _sort_key(col)
+    if limit is not None:
+        pick = heapq.nlargest if descending else heapq.nsmallest
+        return pick(limit, rows, key=key)
+    return sorted(rows, key=key, reverse=descending)
+
+
+def _cast_row(cols: list[str], types: dict[str, str], values_raw: list[str]) -> dict:
+    values: dict = {}
+    idx = 0
+    for col in cols:
+        if col == "ID":
+            continue
+        values[col] = cast_value(values_raw[idx], types[col])
+        idx += 1
+    return values
+
+
+def cast_records(schema: list[dict], records: Iterable[dict]) -> Iterator[dict]:
+    """
+    Lazily cast raw records {column: text} (ID excluded) by schema.
+    Raises KeyError for a missing column and ValueError for a bad value.
+    """
+    cols = [c["name"] for c in schema]
+    types = _schema_map(schema)
+    for rec in records:
+        yield _cast_row(cols, types, [rec[c] for c in cols if c != "ID"])
+
+
 def create_table(metadata: dict,
                  table_name: str,
                  columns: list[tuple[str, str]]
@@ -50,6 +340,7 @@ def create_table(metadata: dict,
     return metadata
 
 
+@confirm_action("удаление таблицы")
 def drop_table(metadata: dict, table_name: str) -> dict:
     """Drop table from metadata."""
     if table_name not in metadata:
@@ -74,9 +365,14 @@ def list_tables(metadata: dict) -> None:
 def insert(metadata: dict,
            table_name: str,
            table_data: list[dict],
-           values_raw: list[str]
+           values_raw: list[str],
+           indexes: dict | None = None,
+           next_id: Callable[[], int] | None = None,
 ) -> list[dict]:
-    """Insert row into table_data. values_raw does not include ID."""
+    """
+    Insert row into table_data. values_raw does not include ID.
+    next_id allocates the new ID; without it ID is max(ID) + 1.
+    """
     if table_name not in metadata:
         print(f'Ошибка: Таблица "{table_name}" не существует.')
         return table_data
@@ -92,52 +388,335 @@ def insert(metadata: dict,
         )
         return table_data
 
-    new_id = 1
-    if table_data:
-        new_id = max(int(r.get("ID", 0)) for r in table_data) + 1
+    values = _cast_row(cols, types, values_raw)
 
-    row: dict = {"ID": new_id}
-    idx = 0
-    for col in cols:
-        if col == "ID":
-            continue
-        row[col] = cast_value(values_raw[idx], types[col])
-        idx += 1
+    if next_id is not None:
+        new_id = next_id()
+    else:
+        new_id = 1
+        if table_data:
+            new_id = max(int(r.get("ID", 0)) for r in table_data) + 1
+
+    row = row_type(cols)({"ID": new_id, **values})
 
     table_data.append(row)
+    for col, index in (indexes or {}).items():
+        index_add(index, row.get(col), new_id)
     print(f'Запись с ID={new_id} успешно добавлена в таблицу "{table_name}".')
     return table_data
 
 
-def select_rows(schema: list[dict],
+def insert_many(metadata: dict,
+                table_name: str,
                 table_data: list[dict],
-                where_clause: dict | None = None
+                rows_raw: list[list[str]],
+                indexes: dict | None = None,
+                next_ids: Callable[[int], range] | None = None,
 ) -> list[dict]:
-    """Return rows filtered by typed where_clause."""
+    """
+    Insert several rows at once. All rows are validated and cast before any
+    is added, so a bad value leaves table_data untouched.
+    next_ids(n) allocates n consecutive IDs in one step.
+    """
+    if table_name not in metadata:
+        print(f'Ошибка: Таблица "{table_name}" не существует.')
+        return table_data
+
+    schema = metadata[table_name]
+    cols = [c["name"] for c in schema]
+    types = _schema_map(schema)
+
+    expected = len(cols) - 1
+    for values_raw in rows_raw:
+        if len(values_raw) != expected:
+            print(
+                f"Некорректное значение: ожидается {expected} значений. "
+                "Попробуйте снова."
+            )
+            return table_data
+
+    batch = [_cast_row(cols, types, values_raw) for values_raw in rows_raw]
+    if not batch:
+        return table_data
+
+    if next_ids is not None:
+        ids = next_ids(len(batch))
+    else:
+        start = max((int(r.get("ID", 0)) for r in table_data), default=0) + 1
+        ids = range(start, start + len(batch))
+
+    row_cls = row_type(cols)
+    new_rows = [row_cls({"ID": new_id, **values}) for new_id, values in zip(ids, batch)]
+    table_data.extend(new_rows)
+    for col, index in (indexes or {}).items():
+        for row in new_rows:
+            index_add(index, row.get(col), row["ID"])
+
+    print(f'Добавлено записей: {len(new_rows)} в таблицу "{table_name}".')
+    return table_data
+
+
+def stream_rows(schema: list[dict],
+                table_data: list[dict],
+                where_clause: dict | tuple | None = None,
+                indexes: dict | None = None,
+                columns: ColumnarTable | None = None,
+                order_by: tuple[str, bool] | None = None,
+                limit: int | None = None,
+                offset: int = 0,
+                pool: ScanPool | None = None,
+) -> Iterator[dict]:
+    """
+    Yield rows filtered by typed where_clause, optionally ordered by
+    (col, descending), with offset/limit. Rows are read straight from
+    table_data, so unordered results are never materialized. Without
+    WHERE, ORDER BY on ID or on a column with a sorted index reads rows in
+    index order; other ORDER BY keeps only the top offset + limit rows.
+    """
+    names = {c["name"] for c in schema}
+    if order_by is not None and order_by[0] not in names:
+        print(f"Ошибка: Таблица или столбец {order_by[0]} не найден.")
+        return
+    top = None if limit is None else offset + limit
+
     if where_clause is None:
-        return list(table_data)
+        rows = iter(table_data)
+        if order_by is not None:
+            rows = _in_index_order(table_data, *order_by, indexes)
+            if rows is None:
+                rows = iter(order_rows(table_data, order_by, top))
+    else:
+        where = as_condition(where_clause)
+        missing = where_columns(where) - names
+        if missing:
+            print(f"Ошибка: Таблица или столбец {min(missing)} не найден.")
+            return
+
+        if top is not None and order_by is None:
+            # a lazy scan stops at the limit; masks would cover every row
+            columns = None
+        positions, match = _where_rows(table_data, where, indexes, columns, pool)
+        if positions is not None:
+            rows = (table_data[p] for p in positions if match(table_data[p]))
+        else:
+            rows = filter(match, table_data)
+        if order_by is not None:
+            rows = iter(order_rows(rows, order_by, top))
 
-    (col, val), = where_clause.items()
-    if col not in {c["name"] for c in schema}:
-        print(f"Ошибка: Таблица или столбец {col} не найден.")
-        return []
+    yield from islice(rows, offset, top)
 
-    return [row for row in table_data if row.get(col) == val]
+
+def select_rows(schema: list[dict],
+                table_data: list[dict],
+                where_clause: dict | tuple | None = None,
+                indexes: dict | None = None,
+                columns: ColumnarTable | None = None,
+                order_by: tuple[str, bool] | None = None,
+                limit: int | None = None,
+                pool: ScanPool | None = None,
+                offset: int = 0,
+) -> list[dict]:
+    """List form of stream_rows()."""
+    return list(
+        stream_rows(
+            schema,
+            table_data,
+            where_clause,
+            indexes,
+            columns,
+            order_by,
+            limit,
+            offset,
+            pool,
+        )
+    )
+
+
+def _index_lookup(side: dict) -> Callable[[object], Iterator[dict]] | None:
+    """value -> rows of side with that join column value via ID or an index."""
+    table_data, col = side["data"], side["col"]
+    index = None if col == "ID" else side["indexes"].get(col)
+    if col != "ID" and index is None:
+        return None
+    match = None if side["where"] is None else compile_predicate(side["where"])
+
+    def lookup(value) -> Iterator[dict]:
+        ids = [value] if index is None else index.get(value, [])
+        for pos in locate_rows(table_data, ids):
+            row = table_data[pos]
+            if match is None or match(row):
+                yield row
+
+    return lookup
+
+
+def _side_rows(side: dict, pool: ScanPool | None) -> Iterator[dict]:
+    return stream_rows(
+        side["schema"],
+        side["data"],
+        side["where"],
+        side["indexes"],
+        side["columns"],
+        pool=pool,
+    )
+
+
+def join_rows(left: dict, right: dict, pool: ScanPool | None = None) -> Iterator[dict]:
+    """
+    Inner equi-join of two tables, yielding merged rows keyed by
+    "<table>.<col>". Each side is a dict with name, schema, data, indexes,
+    columns, col (join column) and where (typed condition or None).
+    If either side has an index on its join column (ID always has one),
+    the other side is streamed and looks rows up in it; otherwise a hash
+    table is built from the matching rows of the smaller side and the
+    larger side probes it, so memory is bounded by the build side.
+    """
+    small, large = sorted((left, right), key=lambda side: len(side["data"]))
+    for probe, build in ((small, large), (large, small)):
+        lookup = _index_lookup(build)
+        if lookup is not None:
+            break
+    else:
+        probe, build = large, small
+        table: dict = {}
+        for row in _side_rows(build, pool):
+            value = row.get(build["col"])
+            if value is not None:
+                table.setdefault(value, []).append(row)
+        lookup = table.get
+
+    names = [
+        [(f"{side['name']}.{c['name']}", c["name"]) for c in side["schema"]]
+        for side in (left, right)
+    ]
+    col = probe["col"]
+    for row in _side_rows(probe, pool):
+        value = row.get(col)
+        if value is None:
+            continue
+        for other in lookup(value) or ():
+            pair = (row, other) if probe is left else (other, row)
+            out: dict = {}
+            for side_names, side_row in zip(names, pair):
+                for qualified, name in side_names:
+                    out[qualified] = side_row.get(name)
+            yield out
+
+
+def aggregate_label(func: str, col: str | None) -> str:
+    return f"{func}({col or '*'})"
+
+
+def _accumulate(state: list, func: str, value) -> None:
+    # state: [count, sum, min, max] of non-None values
+    if value is None:
+        return
+    state[0] += 1
+    if func in ("sum", "avg"):
+        state[1] += value
+    elif func in ("min", "max"):
+        if state[0] == 1 or value < state[2]:
+            state[2] = value
+        if state[0] == 1 or value > state[3]:
+            state[3] = value
+
+
+def _result(state: list, func: str):
+    count = state[0]
+    if func == "count":
+        return count
+    if func == "sum":
+        return state[1]
+    if func == "avg":
+        return state[1] / count if count else None
+    if not count:
+        return None
+    return state[2] if func == "min" else state[3]
+
+
+def aggregate_rows(rows: Iterable[dict],
+                   aggregates: list[tuple[str, str | None]],
+                   group_by: str | None = None,
+) -> list[dict]:
+    """
+    Compute aggregates [(func, col | None for *)] in one pass over rows,
+    hash-grouped by group_by. Returns one dict per group keyed by column
+    name and aggregate label; without GROUP BY always exactly one row.
+    None values are skipped (count(*) counts rows).
+    """
+    groups: dict = {}
+    for row in rows:
+        key = row.get(group_by) if group_by is not None else None
+        states = groups.get(key)
+        if states is None:
+            states = groups[key] = [[0, 0, None, None] for _ in aggregates]
+        for state, (func, col) in zip(states, aggregates):
+            if col is None:
+                state[0] += 1
+            else:
+                _accumulate(state, func, row.get(col))
+
+    if not groups and group_by is None:
+        groups[None] = [[0, 0, None, None] for _ in aggregates]
+    result: list[dict] = []
+    for key, states in groups.items():
+        out = {} if group_by is None else {group_by: key}
+        for state, (func, col) in zip(states, aggregates):
+            out[aggregate_label(func, col)] = _result(state, func)
+        result.append(out)
+    return result
+
+
+def quick_aggregate(table_data: list[dict],
+                    aggregates: list[tuple[str, str | None]],
+                    indexes: dict | None = None,
+) -> dict | None:
+    """
+    Answer whole-table count(*) and min/max on ID or on a sorted-indexed
+    column in O(1) from the resident table and its indexes (both kept up
+    to date on every write). None if some aggregate needs a scan.
+    """
+    out: dict = {}
+    for func, col in aggregates:
+        label = aggregate_label(func, col)
+        if func == "count" and col is None:
+            out[label] = len(table_data)
+        elif func in ("min", "max") and col == "ID":
+            row = table_data[0 if func == "min" else -1] if table_data else None
+            out[label] = row["ID"] if row is not None else None
+        elif func in ("min", "max") and isinstance(
+            (indexes or {}).get(col), SortedIndex
+        ):
+            entries = indexes[col].entries
+            value = None
+            if entries:
+                value = entries[0][0] if func == "min" else entries[-1][0]
+                if value is None:
+                    # missing values at the edge: leave it to the scan
+                    return None
+            out[label] = value
+        else:
+            return None
+    return out
 
 
 def update_rows(
     schema: list[dict],
     table_data: list[dict],
     set_clause: dict,
-    where_clause: dict,
+    where_clause: dict | tuple,
+    indexes: dict | None = None,
+    columns: ColumnarTable | None = None,
+    pool: ScanPool | None = None,
 ) -> tuple[list[dict], list[int]]:
     """Update rows and return (data, updated_ids). Clauses are typed."""
-    (wcol, wval), = where_clause.items()
+    where = as_condition(where_clause)
     (scol, sval), = set_clause.items()
 
     cols = {c["name"] for c in schema}
-    if wcol not in cols:
-        print(f"Ошибка: Таблица или столбец {wcol} не найден.")
+    missing = where_columns(where) - cols
+    if missing:
+        print(f"Ошибка: Таблица или столбец {min(missing)} не найден.")
         return table_data, []
     if scol not in cols:
         print(f"Ошибка: Таблица или столбец {scol} не найден.")
@@ -146,34 +725,65 @@ def update_rows(
         print("Некорректное значение: нельзя менять ID. Попробуйте снова.")
         return table_data, []
 
+    positions, match = _where_rows(table_data, where, indexes, columns, pool)
+    rows = table_data if positions is None else [table_data[p] for p in positions]
+    set_index = (indexes or {}).get(scol)
+
     updated: list[int] = []
-    for row in table_data:
-        if row.get(wcol) == wval:
+    for row in rows:
+        if match(row):
+            row_id = int(row.get("ID", 0))
+            if set_index is not None:
+                index_remove(set_index, row.get(scol), row_id)
+                index_add(set_index, sval, row_id)
             row[scol] = sval
-            updated.append(int(row.get("ID", 0)))
+            updated.append(row_id)
 
     return table_data, updated
 
 
 def delete_rows(schema: list[dict],
                 table_data: list[dict],
-                where_clause: dict
+                where_clause: dict | tuple,
+                indexes: dict | None = None,
+                columns: ColumnarTable | None = None,
+                pool: ScanPool | None = None,
 ) -> tuple[list[dict], list[int]]:
     """Delete rows and return (new_data, deleted_ids). Clause is typed."""
-    (wcol, wval), = where_clause.items()
+    where = as_condition(where_clause)
 
     cols = {c["name"] for c in schema}
-    if wcol not in cols:
-        print(f"Ошибка: Таблица или столбец {wcol} не найден.")
+    missing = where_columns(where) - cols
+    if missing:
+        print(f"Ошибка: Таблица или столбец {min(missing)} не найден.")
         return table_data, []
 
-    kept: list[dict] = []
+    positions, match = _where_rows(table_data, where, indexes, columns, pool)
+    removed: list[dict] = []
+    if positions is not None and len(positions) <= _POP_LIMIT:
+        for p in sorted(positions, reverse=True):
+            if match(table_data[p]):
+                removed.append(table_data.pop(p))
+        removed.reverse()
+        kept = table_data
+    elif positions is not None:
+        hits = {p for p in positions if match(table_data[p])}
+        removed = [table_data[p] for p in sorted(hits)]
+        kept = [row for i, row in enumerate(table_data) if i not in hits]
+    else:
+        kept = []
+        for row in table_data:
+            if match(row):
+                removed.append(row)
+            else:
+                kept.append(row)
+
     deleted: list[int] = []
-    for row in table_data:
-        if row.get(wcol) == wval:
-            deleted.append(int(row.get("ID", 0)))
-        else:
-            kept.append(row)
+    for row in removed:
+        row_id = int(row.get("ID", 0))
+        for col, index in (indexes or {}).items():
+            index_remove(index, row.get(col), row_id)
+        deleted.append(row_id)
 
     return kept, deleted
 
@@ -1,4 +1,13 @@
-import time
+import sys
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+
+from src.primitive_db.metrics import timed
+
+# --yes sets assume_yes to run without confirmation prompts; a script read
+# from stdin clears stdin_answers, as the prompt would eat its next line
+CONFIRM = {"assume_yes": False, "stdin_answers": True}
 
 
 def handle_db_errors(func):
@@ -30,9 +39,16 @@ def confirm_action(action_name: str):
 
     def decorator(func):
         def wrapper(*args, **kwargs):
-            answer = input(
-                f'Вы уверены, что хотите выполнить "{action_name}"? [y/n]: '
-            ).strip().lower()
+            if CONFIRM["assume_yes"]:
+                return func(*args, **kwargs)
+            question = f'Вы уверены, что хотите выполнить "{action_name}"? [y/n]: '
+            try:
+                if not CONFIRM["stdin_answers"]:
+                    print(question, end="")
+                    raise EOFError
+                answer = input(question).strip().lower()
+            except EOFError:
+                answer = ""
             if answer != "y":
                 print("Операция отменена.")
                 # возвращаем "старые данные", чтобы ничего не сломать
@@ -45,32 +61,102 @@ def confirm_action(action_name: str):
 
 
 def log_time(func):
-    """Print execution time of function."""
+    """Record execution time of function in the function_seconds histogram."""
 
     def wrapper(*args, **kwargs):
-        start = time.monotonic()
-        result = func(*args, **kwargs)
-        elapsed = time.monotonic() - start
-        print(f"Функция {func.__name__} выполнилась за {elapsed:.3f} секунд.")
-        return result
+        with timed("function_seconds", function=func.__name__):
+            return func(*args, **kwargs)
 
     return wrapper
 
 
-def create_cacher():
+_SCALARS = (str, bytes, int, float, type(None))
+
+
+def _approx_size(value) -> int:
+    """
+    Rough byte size of a cached value, following containers (lists of rows,
+    tuples, row mappings) and slotted objects such as compiled plans.
     """
-    Closure-based cacher.
+    size = sys.getsizeof(value)
+    if isinstance(value, _SCALARS):
+        return size
+    if isinstance(value, Mapping):
+        # row keys are column names, shared by all rows
+        children = value.values()
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        children = value
+    else:
+        slots = getattr(type(value), "__slots__", ())
+        children = [getattr(value, name, None) for name in slots]
+    return size + sum(map(_approx_size, children))
+
+
+def create_cacher(max_entries: int = 256, max_bytes: int = 64 * 1024 * 1024):
+    """
+    Closure-based LRU cacher bounded by entry count and approximate bytes.
     cache_result(key, value_func): returns cached value by key
     or computes and stores it.
+    cache_result.get(key) / cache_result.put(key, value) split the two
+    steps for values produced incrementally (streamed results).
+    cache_result.stats() returns hit/miss/eviction counters.
+    Safe to share between threads; value_func runs outside the lock.
     """
-    cache: dict = {}
+    cache: OrderedDict = OrderedDict()
+    sizes: dict = {}
+    counters = {"hits": 0, "misses": 0, "evictions": 0, "bytes": 0}
+    lock = threading.Lock()
+    missing = object()
+
+    def get(key, default=None):
+        with lock:
+            value = cache.get(key, missing)
+            if value is missing:
+                counters["misses"] += 1
+                return default
+            cache.move_to_end(key)
+            counters["hits"] += 1
+            return value
+
+    def put(key, value) -> None:
+        size = _approx_size(value)
+        if size > max_bytes:
+            return
+        with lock:
+            if key in cache:
+                counters["bytes"] -= sizes.pop(key)
+            cache[key] = value
+            sizes[key] = size
+            counters["bytes"] += size
+            while len(cache) > max_entries or counters["bytes"] > max_bytes:
+                old_key, _ = cache.popitem(last=False)
+                counters["bytes"] -= sizes.pop(old_key)
+                counters["evictions"] += 1
 
     def cache_result(key, value_func):
-        if key in cache:
-            return cache[key]
-        value = value_func()
-        cache[key] = value
+        value = get(key, missing)
+        if value is missing:
+            value = value_func()
+            put(key, value)
         return value
 
+    def stats() -> dict:
+        with lock:
+            return {
+                **counters,
+                "entries": len(cache),
+                "max_entries": max_entries,
+                "max_bytes": max_bytes,
+            }
+
+    def clear() -> None:
+        with lock:
+            cache.clear()
+            sizes.clear()
+            counters["bytes"] = 0
+
+    cache_result.get = get
+    cache_result.put = put
+    cache_result.stats = stats
+    cache_result.clear = clear
     return cache_result
-
@@ -1,29 +1,136 @@
+import json
+import os
 import shlex
+import sys
+import threading
+import time
+import tracemalloc
+from collections.abc import Iterable, Iterator
+from contextlib import ExitStack, contextmanager
+from itertools import islice
 
 import prompt
 from prettytable import PrettyTable
 
+from src.primitive_db.catalog import Catalog
 from src.primitive_db.core import (
-    cast_value,
+    aggregate_rows,
+    cast_records,
+    compile_predicate,
     create_table,
     delete_rows,
     drop_table,
     insert,
+    insert_many,
+    join_rows,
     list_tables,
-    select_rows,
+    map_conditions,
+    order_rows,
+    quick_aggregate,
+    stream_rows,
     update_rows,
+    where_columns,
 )
-from src.primitive_db.decorators import create_cacher
-from src.primitive_db.parser import parse_clause, parse_values
+from src.primitive_db.decorators import confirm_action, create_cacher
+from src.primitive_db.locks import LOCK_STATS
+from src.primitive_db.metrics import (
+    PROFILER,
+    inc,
+    memory_report,
+    observe,
+    render_prometheus,
+    render_text,
+    reset as metrics_reset,
+    timed,
+    timed_iter,
+)
+from src.primitive_db.parallel import ScanPool
+from src.primitive_db.parser import find_keyword, parse_values
+from src.primitive_db.planner import Plan, compile_statement, normalize
 from src.primitive_db.utils import (
     META_FILE,
-    load_metadata,
-    load_table_data,
-    save_metadata,
-    save_table_data,
+    append_insert_many,
+    catalog_lock,
+    export_rows,
+    fold_log,
+    iter_rows_file,
+    iter_table_rows,
+    last_id,
+    read_rows_file,
+    recover_storage,
+    sync_storage,
+    table_lock,
+    table_version,
+    vacuum_table,
 )
 
-SELECT_CACHE = create_cacher()
+SELECT_CACHE = create_cacher(max_entries=256, max_bytes=64 * 1024 * 1024)
+PLAN_CACHE = create_cacher(max_entries=1024, max_bytes=16 * 1024 * 1024)
+PREPARED: dict[str, tuple] = {}
+DML_COMMANDS = {"insert", "select", "update", "delete"}
+# seconds; 0 writes every change through immediately. Deferred writes are
+# only safe while a single process uses the database.
+FLUSH_INTERVAL = 0.0
+COLUMNAR_MIN_ROWS = 50_000  # None disables columnar scans
+SCAN_WORKERS = os.cpu_count() or 1  # 1 disables parallel scans
+PARALLEL_MIN_ROWS = 200_000  # smaller tables are scanned in-process
+SCAN_POOL = ScanPool(workers=SCAN_WORKERS, min_rows=PARALLEL_MIN_ROWS)
+OUTPUT_FORMATS = ("table", "tsv", "jsonl")
+OUTPUT = {"format": "table", "pager": False}
+_session = threading.local()  # output settings of the thread's connection
+PAGE_ROWS = 500  # rows per printed chunk, bounds output memory
+PAGER_ROWS = 20  # rows per screen in pager mode
+SELECT_CACHE_ROWS = 10_000  # larger results are streamed but not cached
+IMPORT_BATCH_ROWS = 10_000  # rows cast and written per step of import
+# command -> position of the table name among its words
+_TABLE_READS = {"select": 2, "export": 1}
+_TABLE_WRITES = {
+    "insert": 2,
+    "update": 1,
+    "delete": 2,
+    "load": 1,
+    "import": 3,
+    "create_index": 1,
+    "vacuum": 1,
+}
+# metric label of a command: its first word if known, else "other"
+COMMAND_NAMES = {
+    "select", "insert", "update", "delete", "execute", "prepare", "load",
+    "import", "export", "create_table", "drop_table", "create_index", "list_tables",
+    "begin", "commit", "rollback", "format", "pager", "stats", "profile",
+    "memtrace", "cache_stats", "lock_stats", "vacuum", "help", "exit",
+}
+# DDL and session-wide settings run with nothing else in flight
+_CATALOG_COMMANDS = {
+    "create_table", "drop_table", "begin", "commit", "rollback", "format", "prepare",
+}
+# commands that write around the catalog's in-memory tables, so they cannot
+# be part of a transaction (vacuum rewrites the files and changes their stamp)
+_NO_TRANSACTION = {"create_table", "drop_table", "create_index", "import", "vacuum"}
+
+
+def _build_catalog() -> Catalog:
+    return Catalog(
+        META_FILE,
+        flush_interval=FLUSH_INTERVAL,
+        columnar_min_rows=COLUMNAR_MIN_ROWS,
+    )
+
+
+# defaults for code that imports the engine; entry points call configure()
+CATALOG = _build_catalog()
+
+
+def configure() -> None:
+    """
+    Rebuild the session catalog and scan pool from the settings above
+    (FLUSH_INTERVAL, COLUMNAR_MIN_ROWS, SCAN_WORKERS, PARALLEL_MIN_ROWS),
+    so values changed after import take effect. Drops the cached tables.
+    """
+    global CATALOG, SCAN_POOL
+    SCAN_POOL.close()
+    SCAN_POOL = ScanPool(workers=SCAN_WORKERS, min_rows=PARALLEL_MIN_ROWS)
+    CATALOG = _build_catalog()
 
 
 def print_help() -> None:
@@ -31,268 +138,1032 @@ def print_help() -> None:
     print("Таблицы:")
     print("<command> create_table <имя_таблицы> <столбец1:тип> ... - создать таблицу")
     print("<command> list_tables - показать список таблиц")
-    print("<command> drop_table <имя_таблицы> - удалить таблицу\n")
+    print("<command> drop_table <имя_таблицы> - удалить таблицу")
+    print(
+        "<command> create_index <имя_таблицы> <столбец> [hash|sorted] - создать "
+        "индекс по столбцу"
+    )
+    print(
+        "<command> vacuum <имя_таблицы> - освободить место удалённых записей\n"
+    )
 
     print("CRUD:")
     print(
         '<command> insert into <имя_таблицы> values ("text", 1, true) - создать запись'
     )
+    print(
+        "<command> insert into <имя_таблицы> values (...), (...) - создать "
+        "несколько записей"
+    )
+    print(
+        "<command> load <имя_таблицы> from <файл.csv|.jsonl> - загрузить записи "
+        "из файла"
+    )
+    print(
+        "<command> import <файл.csv|.jsonl> into <имя_таблицы> - потоковый импорт "
+        "записей из файла"
+    )
+    print(
+        "<command> export <имя_таблицы> to <файл.csv|.jsonl|.json> [where ...] - "
+        "потоковая выгрузка записей в файл"
+    )
     print("<command> select from <имя_таблицы> - прочитать все записи")
     print(
         "<command> select from <имя_таблицы> where <col> = <val> - прочитать по условию"
     )
+    print(
+        "<command> select from <имя_таблицы> where <col> <|<=|>|>= <val> "
+        "(или between <a> and <b>) order by <col> [asc|desc] limit <n> "
+        "offset <m>"
+    )
+    print(
+        "<command> ... where <условие> and|or <условие>, not <условие>, "
+        "<col> [not] in (<val>, ...), <col> != <val>, скобки - составные условия"
+    )
+    print(
+        "<command> select <col>, count(*), sum|min|max|avg(<col>) from "
+        "<имя_таблицы> [where ...] group by <col> - агрегаты"
+    )
+    print(
+        "<command> select from <a> join <b> on <a.col> = <b.col> "
+        "[where <a.col> = <val>] - соединить таблицы"
+    )
     print(
         "<command> update <имя_таблицы> set <col> = <val> "
         "where <col> = <val> - обновить"
     )
     print("<command> delete from <имя_таблицы> where <col> = <val> - удалить\n")
 
+    print("Подготовленные запросы:")
+    print(
+        "<command> prepare <имя> as <запрос с ? вместо значений> - подготовить запрос"
+    )
+    print("<command> execute <имя> (<знач1>, <знач2>, ...) - выполнить запрос\n")
+
     print("Общие команды:")
+    print("<command> format <table|tsv|jsonl> - формат вывода select")
+    print("<command> pager <on|off> - постраничный вывод select")
+    print("<command> cache_stats - статистика кэшей select и планов")
+    print("<command> lock_stats - статистика ожидания блокировок таблиц")
+    print("<command> stats [reset] - метрики команд, таблиц и фаз выполнения")
+    print("<command> stats export <файл> - метрики в формате Prometheus")
+    print(
+        f"<command> profile on|off|show|dump <файл> - cProfile каждой "
+        f"{PROFILER.every}-й команды"
+    )
+    print("<command> memtrace on|off - трассировка памяти (tracemalloc)")
+    print("<command> begin - начать транзакцию (изменения копятся в памяти)")
+    print(
+        "<command> commit - зафиксировать транзакцию (вне её - записать "
+        "отложенные изменения на диск)"
+    )
+    print("<command> rollback - отменить изменения транзакции")
     print("<command> exit - выход")
     print("<command> help - справка\n")
 
 
-def _print_table(schema: list[dict], rows: list[dict]) -> None:
+def _tsv_field(value) -> str:
+    if value is None:
+        return ""
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+
+def output_settings() -> dict:
+    """Output format and pager mode in effect: the connection's or OUTPUT."""
+    output = getattr(_session, "output", None)
+    return OUTPUT if output is None else output
+
+
+@contextmanager
+def session_output(output: dict):
+    """Run this thread's commands with their own output settings."""
+    _session.output = output
+    try:
+        yield
+    finally:
+        _session.output = None
+
+
+def _render(columns: list[str],
+            rows: list[dict],
+            fmt: str,
+            first: bool,
+            widths: list[int],
+) -> str:
+    """
+    Text of one chunk of result rows in the given output format. A table
+    chunk continues one grid: the first chunk fixes the column widths (kept
+    in widths) and later ones reuse them, with no header and no closing
+    border, which _grid_border draws once at the end.
+    """
+    if fmt == "jsonl":
+        return "".join(
+            json.dumps({c: row.get(c) for c in columns}, ensure_ascii=False) + "\n"
+            for row in rows
+        )
+    if fmt == "tsv":
+        lines = ["\t".join(columns)] if first else []
+        lines += ["\t".join(_tsv_field(row.get(c)) for c in columns) for row in rows]
+        return "".join(line + "\n" for line in lines)
     table = PrettyTable()
-    columns = [c["name"] for c in schema]
     table.field_names = columns
+    if not first:
+        table.header = False
+        fixed = dict(zip(columns, widths))
+        # longer values wrap inside the column instead of widening it
+        table.min_width = table.max_width = fixed
     for row in rows:
         table.add_row([row.get(col) for col in columns])
-    print(table)
+    lines = table.get_string().splitlines()
+    if first:
+        widths[:] = [len(part) - 2 for part in lines[0].strip("+").split("+")]
+        return "".join(line + "\n" for line in lines[:-1])
+    return "".join(line + "\n" for line in lines[1:-1])
 
 
-def welcome() -> None:
-    print("\n***База данных***")
-    print_help()
+def _grid_border(widths: list[int]) -> str:
+    return "+" + "+".join("-" * (width + 2) for width in widths) + "+\n"
 
-    while True:
-        user_input = prompt.string(">>>Введите команду: ").strip()
-        if not user_input:
-            continue
 
-        if user_input == "exit":
-            return
+def _print_table(schema: list[dict],
+                 rows: Iterable[dict],
+                 table_name: str = "",
+) -> None:
+    """
+    Print rows chunk by chunk as they arrive, so output starts right away
+    and memory is bounded by the chunk size; a table stays one grid. In
+    pager mode wait for Enter after each screen; q stops reading the result.
+    """
+    columns = [c["name"] for c in schema]
+    output = output_settings()
+    fmt = output["format"]
+    size = PAGER_ROWS if output["pager"] else PAGE_ROWS
+    rows = iter(rows)
+    chunk = list(islice(rows, size))
+    first = True
+    widths: list[int] = []
+    printed = 0
+    rendering = 0.0
+    while chunk or first:
+        start = time.perf_counter()
+        sys.stdout.write(_render(columns, chunk, fmt, first, widths))
+        sys.stdout.flush()
+        rendering += time.perf_counter() - start
+        printed += len(chunk)
+        first = False
+        if len(chunk) < size:
+            break
+        chunk = list(islice(rows, size))
+        if chunk and output["pager"]:
+            answer = input("-- далее: Enter, выход: q --").strip().lower()
+            if answer == "q":
+                break
+    if fmt == "table":
+        sys.stdout.write(_grid_border(widths))
+    observe("phase_seconds", rendering, phase="render", table=table_name)
+    inc("rows_total", printed, op="select", table=table_name)
 
-        if user_input == "help":
-            print_help()
-            continue
 
+def _cached_stream(key, rows: Iterable[dict]) -> Iterator[dict]:
+    """Yield rows and put the whole result into SELECT_CACHE if it is small."""
+    kept: list[dict] | None = []
+    for row in rows:
+        if kept is not None:
+            kept.append(row)
+            if len(kept) > SELECT_CACHE_ROWS:
+                kept = None
+        yield row
+    if kept is not None:
+        SELECT_CACHE.put(key, kept)
+
+
+def _print_cache_stats() -> None:
+    for title, cache in (("select", SELECT_CACHE), ("планов", PLAN_CACHE)):
+        stats = cache.stats()
+        lookups = stats["hits"] + stats["misses"]
+        ratio = stats["hits"] / lookups if lookups else 0.0
+        print(
+            f"Кэш {title}: записей {stats['entries']}/{stats['max_entries']}, "
+            f"байт {stats['bytes']}/{stats['max_bytes']}, "
+            f"попаданий {stats['hits']}, промахов {stats['misses']} "
+            f"({ratio:.0%}), вытеснений {stats['evictions']}"
+        )
+
+
+def _instrumentation(words: list[str]) -> None:
+    """stats [reset|export <file>], profile on|off|show|dump <file>, memtrace on|off."""
+    cmd, rest = words[0], words[1:]
+    if cmd == "stats" and not rest:
+        print(render_text())
+        print(memory_report())
+    elif cmd == "stats" and rest == ["reset"]:
+        metrics_reset()
+        PROFILER.reset()
+    elif cmd == "stats" and len(rest) == 2 and rest[0] == "export":
+        with open(rest[1], "w", encoding="utf-8") as f:
+            f.write(render_prometheus())
+        print(f"Метрики записаны в {rest[1]}.")
+    elif cmd == "profile" and rest in (["on"], ["off"]):
+        PROFILER.enabled = rest == ["on"]
+    elif cmd == "profile" and rest == ["show"]:
+        print(PROFILER.report())
+    elif cmd == "profile" and len(rest) == 2 and rest[0] == "dump":
+        PROFILER.dump(rest[1])
+        print(f"Профиль записан в {rest[1]}.")
+    elif cmd == "memtrace" and rest == ["on"]:
+        tracemalloc.start()
+    elif cmd == "memtrace" and rest == ["off"]:
+        tracemalloc.stop()
+    else:
+        print(f"Некорректное значение: {' '.join(words)}. Попробуйте снова.")
+
+
+def _print_lock_stats() -> None:
+    titles = {"shared": "Разделяемые", "exclusive": "Монопольные"}
+    for mode, stats in LOCK_STATS.items():
+        contended = stats["contended"]
+        mean = stats["wait_total"] / contended if contended else 0.0
+        print(
+            f"{titles[mode]} блокировки: захватов {stats['acquired']}, "
+            f"с ожиданием {contended}, ожидание всего {stats['wait_total']:.3f} с, "
+            f"среднее {mean * 1000:.3f} мс, макс {stats['wait_max'] * 1000:.3f} мс"
+        )
+
+
+def _bulk_insert(metadata: dict, table_name: str, rows_raw: list[list[str]]) -> None:
+    table_data = CATALOG.table(table_name)
+    indexes = CATALOG.indexes(table_name)
+    before = len(table_data)
+    try:
+        with timed("phase_seconds", phase="apply", table=table_name):
+            new_data = insert_many(
+                metadata,
+                table_name,
+                table_data,
+                rows_raw,
+                indexes,
+                next_ids=lambda n: CATALOG.next_ids(table_name, n),
+            )
+    except ValueError as e:
+        print(str(e))
+        return
+    if len(new_data) > before:
+        CATALOG.record_insert_many(table_name, new_data[before:])
+        inc("rows_total", len(new_data) - before, op="insert", table=table_name)
+
+
+def _rate(count: int, seconds: float) -> str:
+    return f"{count / seconds:.0f}" if seconds > 0 else "-"
+
+
+def _export(metadata: dict, table_name: str, path: str, where_text: str) -> None:
+    """
+    Stream the table's rows (those matching where_text, if given) into a
+    file. A resident table is scanned in place; otherwise rows come straight
+    from storage without loading the table.
+    """
+    if table_name not in metadata:
+        print(f'Ошибка: Таблица "{table_name}" не существует.')
+        return
+    schema = metadata[table_name]
+    where = None
+    if where_text:
+        plan = _compile(f"select from {table_name} where {where_text}", metadata)
+        if plan.param_types or plan.order_by or plan.limit is not None or plan.offset:
+            raise ValueError(f"Некорректное значение: {where_text}. Попробуйте снова.")
+        where = plan.where
+
+    # no flush: unsaved changes exist only for resident tables, which are
+    # exported from memory (and the shared table lock forbids saving here)
+    start = time.perf_counter()
+    if CATALOG.resident(table_name):
+        rows = stream_rows(
+            schema,
+            CATALOG.table(table_name),
+            where,
+            CATALOG.indexes(table_name),
+            CATALOG.columnar(table_name, schema),
+            pool=SCAN_POOL,
+        )
+    else:
+        rows = iter_table_rows(table_name)
+        if where is not None:
+            rows = filter(compile_predicate(where), rows)
+    count = export_rows(rows, [c["name"] for c in schema], path)
+    seconds = time.perf_counter() - start
+    inc("rows_total", count, op="export", table=table_name)
+    print(
+        f'Экспортировано записей: {count} из таблицы "{table_name}" '
+        f"за {seconds:.2f} с ({_rate(count, seconds)} записей/с)."
+    )
+
+
+def _import(metadata: dict, table_name: str, path: str) -> None:
+    """
+    Stream a .csv/.jsonl file into the table in batches of IMPORT_BATCH_ROWS
+    written straight to storage, so neither the file nor the table is held
+    in memory. Batches already written are kept if a later row is bad.
+    """
+    if table_name not in metadata:
+        print(f'Ошибка: Таблица "{table_name}" не существует.')
+        return
+    CATALOG.flush()
+    if CATALOG.resident(table_name):
+        last = CATALOG.last_id(table_name)
+    else:
+        last = last_id(table_name)
+    # the resident copy and its indexes would go stale: reload on next use
+    CATALOG.forget(table_name)
+
+    count = 0
+    failed = False
+    start = time.perf_counter()
+    records = cast_records(metadata[table_name], iter_rows_file(path))
+    try:
+        while batch := list(islice(records, IMPORT_BATCH_ROWS)):
+            ids = range(last + count + 1, last + count + len(batch) + 1)
+            rows = [{"ID": row_id, **values} for row_id, values in zip(ids, batch)]
+            with timed("phase_seconds", phase="save", table=table_name):
+                append_insert_many(table_name, rows)
+                fold_log(table_name)
+            count += len(batch)
+    except FileNotFoundError:
+        print(f"Ошибка: Файл {path} не найден.")
+        failed = True
+    except KeyError as e:
+        print(f"Ошибка: Таблица или столбец {e.args[0]} не найден.")
+        failed = True
+    except ValueError as e:
+        print(str(e))
+        failed = True
+    seconds = time.perf_counter() - start
+    inc("rows_total", count, op="insert", table=table_name)
+    if failed and not count:
+        return
+    print(
+        f'Импортировано записей: {count} в таблицу "{table_name}" '
+        f"за {seconds:.2f} с ({_rate(count, seconds)} записей/с)."
+    )
+
+
+def _transaction(command: str) -> None:
+    """
+    begin / commit / rollback. Outside a transaction commit just saves
+    deferred writes (FLUSH_INTERVAL) and syncs the log.
+    """
+    if command == "begin":
+        if CATALOG.in_transaction():
+            print("Ошибка: Транзакция уже начата.")
+            return
+        CATALOG.begin()
+        print("Транзакция начата.")
+    elif not CATALOG.in_transaction():
+        if command == "rollback":
+            print("Ошибка: Транзакция не начата.")
+            return
+        CATALOG.flush()
+        sync_storage()
+    elif command == "commit":
         try:
-            args = shlex.split(user_input)
-        except ValueError:
-            print(f"Некорректное значение: {user_input}. Попробуйте снова.")
-            continue
+            with timed("phase_seconds", phase="save"):
+                count = CATALOG.commit()
+        except ValueError as e:
+            print(str(e))
+            return
+        sync_storage()
+        print(f"Транзакция зафиксирована, записано таблиц: {count}.")
+    else:
+        CATALOG.rollback()
+        print("Транзакция отменена.")
 
-        if not args:
-            continue
 
-        cmd = args[0]
-        metadata = load_metadata(META_FILE)
-
-        # ---------- TABLES ----------
-        if cmd == "create_table":
-            if len(args) < 3:
-                print(f"Некорректное значение: {user_input}. Попробуйте снова.")
-                continue
-
-            table_name = args[1]
-            raw_cols = args[2:]
-
-            columns: list[tuple[str, str]] = []
-            ok = True
-            for part in raw_cols:
-                if ":" not in part:
-                    print(f"Некорректное значение: {part}. Попробуйте снова.")
-                    ok = False
-                    break
-                name, typ = part.split(":", 1)
-                name = name.strip()
-                typ = typ.strip()
-                if not name or not typ:
-                    print(f"Некорректное значение: {part}. Попробуйте снова.")
-                    ok = False
-                    break
-                columns.append((name, typ))
-
-            if not ok:
-                continue
-
-            new_meta = create_table(metadata, table_name, columns)
-            save_metadata(META_FILE, new_meta)
-            continue
+def _compile(user_input: str, metadata: dict) -> Plan | None:
+    """Compiled plan for a DML statement, from PLAN_CACHE when possible."""
+    if user_input.split(None, 1)[0].lower() not in DML_COMMANDS:
+        return None
+    key = (normalize(user_input), CATALOG.metadata_version())
+    with timed("phase_seconds", phase="parse"):
+        return PLAN_CACHE(key, lambda: compile_statement(user_input, metadata))
 
-        if cmd == "list_tables":
-            list_tables(metadata)
-            continue
 
-        if cmd == "drop_table":
-            if len(args) != 2:
-                print(f"Некорректное значение: {user_input}. Попробуйте снова.")
-                continue
-            table_name = args[1]
-            new_meta = drop_table(metadata, table_name)
-            save_metadata(META_FILE, new_meta)
-            continue
+def _prepare(name: str, text: str, metadata: dict) -> None:
+    plan = compile_statement(text, metadata)
+    if plan is None:
+        raise ValueError(f"Некорректное значение: {text}. Попробуйте снова.")
+    PREPARED[name] = (text, CATALOG.metadata_version(), plan)
 
-        # ---------- INSERT ----------
-        if len(args) >= 4 and args[0] == "insert" and args[1] == "into":
-            table_name = args[2]
-            low = user_input.lower()
-            idx = low.find(" values ")
-            if idx == -1:
-                print(f"Некорректное значение: {user_input}. Попробуйте снова.")
-                continue
-
-            values_part = user_input[idx + len(" values ") :].strip()
-            try:
-                values_raw = parse_values(values_part)
-            except ValueError as e:
-                print(str(e))
-                continue
-
-            table_data = load_table_data(table_name)
-            new_data = insert(metadata, table_name, table_data, values_raw)
-            save_table_data(table_name, new_data)
-            continue
 
-        # ---------- SELECT ----------
-        if len(args) >= 3 and args[0] == "select" and args[1] == "from":
-            table_name = args[2]
-            if table_name not in metadata:
-                print(f'Ошибка: Таблица "{table_name}" не существует.')
-                continue
+def _prepared(name: str, metadata: dict) -> Plan:
+    if name not in PREPARED:
+        raise ValueError(f"Некорректное значение: {name}. Попробуйте снова.")
+    text, version, plan = PREPARED[name]
+    if version != CATALOG.metadata_version():
+        # schema changed since prepare: recompile against the new one
+        _prepare(name, text, metadata)
+        plan = PREPARED[name][2]
+    return plan
+
 
-            schema = metadata[table_name]
-            table_data = load_table_data(table_name)
+def _run_insert(plan: Plan) -> None:
+    metadata = CATALOG.metadata()
+    table_name = plan.table
+    if len(plan.rows_raw) > 1:
+        _bulk_insert(metadata, table_name, plan.rows_raw)
+        return
 
-            where_typed = None
-            where_text = ""
+    table_data = CATALOG.table(table_name)
+    indexes = CATALOG.indexes(table_name)
+    before = len(table_data)
+    try:
+        with timed("phase_seconds", phase="apply", table=table_name):
+            new_data = insert(
+                metadata,
+                table_name,
+                table_data,
+                plan.rows_raw[0],
+                indexes,
+                next_id=lambda: CATALOG.next_ids(table_name, 1)[0],
+            )
+    except ValueError as e:
+        print(str(e))
+        return
+    if len(new_data) > before:
+        CATALOG.record_insert(table_name, new_data[-1])
+        inc("rows_total", op="insert", table=table_name)
 
-            if len(args) > 3:
-                if args[3] != "where":
-                    print(f"Функции {cmd} нет. Попробуйте снова.")
-                    continue
 
-                where_text = user_input.split(" where ", 1)[1].strip()
-                try:
-                    raw_where = parse_clause(where_text)
-                except ValueError as e:
-                    print(str(e))
-                    continue
+def _run_select(plan: Plan) -> None:
+    table_name, schema = plan.table, plan.schema
+    cache_key = (
+        table_name,
+        plan.where,
+        plan.order_by,
+        plan.limit,
+        plan.offset,
+        tuple(plan.projection),
+        plan.group_by,
+        plan.join,
+        table_version(table_name),
+        table_version(plan.join[0]) if plan.join else None,
+    )
+    if plan.aggregates:
+        _run_aggregate(plan, cache_key)
+        return
+    if plan.join is not None:
+        schema = _join_schema(plan)
+    cached = SELECT_CACHE.get(cache_key)
+    if cached is not None:
+        _print_table(schema, cached, table_name)
+        return
 
-                types = {c["name"]: c["type"] for c in schema}
-                (col, raw_val), = raw_where.items()
-                if col not in types:
-                    print(f"Ошибка: Таблица или столбец {col} не найден.")
-                    continue
+    if plan.join is not None:
+        rows = _join_stream(plan)
+    elif (rows := CATALOG.cold_select(table_name, plan.where)) is not None:
+        top = None if plan.limit is None else plan.offset + plan.limit
+        rows = islice(order_rows(rows, plan.order_by, top), plan.offset, None)
+    else:
+        table_data = CATALOG.table(table_name)
+        indexes = CATALOG.indexes(table_name)
+        columns = CATALOG.columnar(table_name, schema)
+        rows = stream_rows(
+            schema,
+            table_data,
+            plan.where,
+            indexes,
+            columns,
+            plan.order_by,
+            plan.limit,
+            plan.offset,
+            pool=SCAN_POOL,
+        )
+    rows = timed_iter(rows, "phase_seconds", phase="filter", table=table_name)
+    _print_table(schema, _cached_stream(cache_key, rows), table_name)
 
-                where_typed = {col: cast_value(raw_val, types[col])}
 
-            cache_key = (table_name, where_text, len(table_data))
+def _join_schema(plan: Plan) -> list[dict]:
+    right = plan.join[0]
+    return [
+        {"name": f"{name}.{c['name']}", "type": c["type"]}
+        for name, schema in (
+            (plan.table, plan.schema),
+            (right, CATALOG.metadata()[right]),
+        )
+        for c in schema
+    ]
 
-            def compute():
-                return select_rows(schema, table_data, where_typed)
 
-            rows = SELECT_CACHE(cache_key, compute)
-            _print_table(schema, rows)
-            continue
+def _conjuncts(where: tuple | None) -> list[tuple]:
+    if where is None:
+        return []
+    if len(where) == 2 and where[0] == "and":
+        return list(where[1])
+    return [where]
+
+
+def _conjunction(parts: list[tuple]) -> tuple | None:
+    if len(parts) > 1:
+        return "and", tuple(parts)
+    return parts[0] if parts else None
+
 
-        # ---------- UPDATE ----------
-        if len(args) >= 2 and args[0] == "update":
-            table_name = args[1]
-            if table_name not in metadata:
-                print(f'Ошибка: Таблица "{table_name}" не существует.')
-                continue
-
-            schema = metadata[table_name]
-
-            low = user_input.lower()
-            idx_set = low.find(" set ")
-            idx_where = low.find(" where ")
-            if idx_set == -1 or idx_where == -1 or idx_where < idx_set:
-                print(f"Некорректное значение: {user_input}. Попробуйте снова.")
-                continue
-
-            set_text = user_input[idx_set + len(" set ") : idx_where].strip()
-            where_text = user_input[idx_where + len(" where ") :].strip()
-
-            try:
-                raw_set = parse_clause(set_text)
-                raw_where = parse_clause(where_text)
-            except ValueError as e:
-                print(str(e))
-                continue
-
-            types = {c["name"]: c["type"] for c in schema}
-            (scol, sraw), = raw_set.items()
-            (wcol, wraw), = raw_where.items()
-
-            if scol not in types:
-                print(f"Ошибка: Таблица или столбец {scol} не найден.")
-                continue
-            if wcol not in types:
-                print(f"Ошибка: Таблица или столбец {wcol} не найден.")
-                continue
-
-            set_typed = {scol: cast_value(sraw, types[scol])}
-            where_typed = {wcol: cast_value(wraw, types[wcol])}
-
-            table_data = load_table_data(table_name)
-            new_data, ids = update_rows(schema, table_data, set_typed, where_typed)
-            save_table_data(table_name, new_data)
-
-            if len(ids) == 1:
-                print(
-                    f'Запись с ID={ids[0]} в таблице "{table_name}" успешно обновлена.'
+def _join_stream(plan: Plan) -> Iterator[dict]:
+    """Joined rows of a join plan, WHERE pushed down to its table's side."""
+    right, left_col, right_col = plan.join
+    pushed: dict[str, list[tuple]] = {plan.table: [], right: []}
+    residual: list[tuple] = []
+    for part in _conjuncts(plan.where):
+        columns = where_columns(part)
+        for name, parts in pushed.items():
+            size = len(name) + 1
+            if all(col.startswith(f"{name}.") for col in columns):
+                parts.append(
+                    map_conditions(part, lambda leaf: (leaf[0][size:], *leaf[1:]))
                 )
-            elif len(ids) > 1:
-                print(f'Обновлено записей: {len(ids)} в таблице "{table_name}".')
-            else:
-                print("Записи не найдены.")
-            continue
+                break
+        else:
+            # compares columns of both tables: checked on joined rows
+            residual.append(part)
 
-        # ---------- DELETE ----------
-        if len(args) >= 4 and args[0] == "delete" and args[1] == "from":
-            table_name = args[2]
-            if table_name not in metadata:
-                print(f'Ошибка: Таблица "{table_name}" не существует.')
-                continue
+    sides = []
+    for name, col in ((plan.table, left_col), (right, right_col)):
+        schema = CATALOG.metadata()[name]
+        sides.append(
+            {
+                "name": name,
+                "schema": schema,
+                "data": CATALOG.table(name),
+                "indexes": CATALOG.indexes(name),
+                "columns": CATALOG.columnar(name, schema),
+                "col": col,
+                "where": _conjunction(pushed[name]),
+            }
+        )
+    rows = join_rows(*sides, pool=SCAN_POOL)
+    if residual:
+        rows = filter(compile_predicate(_conjunction(residual)), rows)
+    top = None if plan.limit is None else plan.offset + plan.limit
+    if plan.order_by is not None:
+        rows = iter(order_rows(rows, plan.order_by, top))
+    return islice(rows, plan.offset, top)
 
-            schema = metadata[table_name]
 
-            if " where " not in user_input.lower():
-                print(f"Некорректное значение: {user_input}. Попробуйте снова.")
-                continue
+def _run_aggregate(plan: Plan, cache_key: tuple) -> None:
+    table_name, schema = plan.table, plan.schema
 
-            where_text = user_input.split(" where ", 1)[1].strip()
-            try:
-                raw_where = parse_clause(where_text)
-            except ValueError as e:
-                print(str(e))
-                continue
+    def compute():
+        table_data = CATALOG.table(table_name)
+        indexes = CATALOG.indexes(table_name)
+        if plan.where is None and plan.group_by is None:
+            quick = quick_aggregate(table_data, plan.aggregates, indexes)
+            if quick is not None:
+                return [quick]
+        rows = stream_rows(
+            schema,
+            table_data,
+            plan.where,
+            indexes,
+            CATALOG.columnar(table_name, schema),
+            pool=SCAN_POOL,
+        )
+        with timed("phase_seconds", phase="filter", table=table_name):
+            groups = aggregate_rows(rows, plan.aggregates, plan.group_by)
+        top = None if plan.limit is None else plan.offset + plan.limit
+        return order_rows(groups, plan.order_by, top)[plan.offset :]
 
-            types = {c["name"]: c["type"] for c in schema}
-            (wcol, wraw), = raw_where.items()
+    columns = [{"name": name} for name in plan.projection]
+    _print_table(columns, SELECT_CACHE(cache_key, compute), table_name)
 
-            if wcol not in types:
-                print(f"Ошибка: Таблица или столбец {wcol} не найден.")
-                continue
 
-            where_typed = {wcol: cast_value(wraw, types[wcol])}
+def _run_update(plan: Plan) -> None:
+    table_name, schema = plan.table, plan.schema
+    table_data = CATALOG.table(table_name)
+    indexes = CATALOG.indexes(table_name)
+    columns = CATALOG.columnar(table_name, schema)
+    with timed("phase_seconds", phase="filter", table=table_name):
+        new_data, ids = update_rows(
+            schema,
+            table_data,
+            plan.set_clause,
+            plan.where,
+            indexes,
+            columns,
+            pool=SCAN_POOL,
+        )
+    if ids:
+        CATALOG.record_update(table_name, ids, plan.set_clause)
+        inc("rows_total", len(ids), op="update", table=table_name)
 
-            table_data = load_table_data(table_name)
-            new_data, ids = delete_rows(schema, table_data, where_typed)
-            save_table_data(table_name, new_data)
+    if len(ids) == 1:
+        print(f'Запись с ID={ids[0]} в таблице "{table_name}" успешно обновлена.')
+    elif len(ids) > 1:
+        print(f'Обновлено записей: {len(ids)} в таблице "{table_name}".')
+    else:
+        print("Записи не найдены.")
 
-            if len(ids) == 1:
-                print(
-                    f'Запись с ID={ids[0]} успешно удалена из таблицы "{table_name}".'
-                )
-            elif len(ids) > 1:
-                print(f'Удалено записей: {len(ids)} из таблицы "{table_name}".')
-            else:
-                print("Записи не найдены.")
+
+@confirm_action("удаление записей")
+def _run_delete(plan: Plan) -> None:
+    table_name, schema = plan.table, plan.schema
+    table_data = CATALOG.table(table_name)
+    indexes = CATALOG.indexes(table_name)
+    columns = CATALOG.columnar(table_name, schema)
+    last = table_data[-1]["ID"] if table_data else None
+    with timed("phase_seconds", phase="filter", table=table_name):
+        new_data, ids = delete_rows(
+            schema,
+            table_data,
+            plan.where,
+            indexes,
+            columns,
+            pool=SCAN_POOL,
+        )
+    if ids:
+        if last in ids:
+            # the highest ID leaves the table: keep it from being handed out again
+            CATALOG.keep_last_id(table_name, last)
+        CATALOG.record_delete(table_name, ids, new_data)
+        inc("rows_total", len(ids), op="delete", table=table_name)
+
+    if len(ids) == 1:
+        print(f'Запись с ID={ids[0]} успешно удалена из таблицы "{table_name}".')
+    elif len(ids) > 1:
+        print(f'Удалено записей: {len(ids)} из таблицы "{table_name}".')
+    else:
+        print("Записи не найдены.")
+
+
+_RUNNERS = {
+    "insert": _run_insert,
+    "select": _run_select,
+    "update": _run_update,
+    "delete": _run_delete,
+}
+
+
+def run_plan(plan: Plan) -> None:
+    """Execute a compiled statement against the session catalog."""
+    if plan.param_types:
+        print("Некорректное значение: ?. Попробуйте снова.")
+        return
+    _RUNNERS[plan.kind](plan)
+
+
+def classify_command(line: str) -> tuple[str, str]:
+    """
+    ("read" | "write" | "catalog", table) for a command line: what it
+    touches and how. Catalog commands (DDL, session settings) run alone;
+    table name is "" for them.
+    """
+    words = line.split()
+    cmd = words[0].lower() if words else ""
+    if cmd == "execute" and len(words) > 1 and words[1] in PREPARED:
+        plan = PREPARED[words[1]][2]
+        return ("read" if plan.kind == "select" else "write"), plan.table
+    lowered = [w.lower() for w in words]
+    if cmd == "select" and "from" in lowered[1:-1]:
+        # select <list> from <table>: the table follows the first "from"
+        return "read", words[lowered.index("from") + 1]
+    if cmd in _TABLE_READS and len(words) > _TABLE_READS[cmd]:
+        return "read", words[_TABLE_READS[cmd]]
+    if cmd in _TABLE_WRITES and len(words) > _TABLE_WRITES[cmd]:
+        return "write", words[_TABLE_WRITES[cmd]]
+    if cmd in _CATALOG_COMMANDS:
+        return "catalog", ""
+    # help, list_tables, cache_stats and malformed commands
+    return "read", ""
+
+
+def command_tables(line: str) -> list[str]:
+    """All tables a command touches, sorted: the order their locks are taken."""
+    mode, table_name = classify_command(line)
+    tables = {table_name} if table_name else set()
+    words = line.split()
+    lowered = [w.lower() for w in words]
+    if lowered[:1] == ["execute"] and len(words) > 1 and words[1] in PREPARED:
+        join = PREPARED[words[1]][2].join
+        if join is not None:
+            tables.add(join[0])
+    elif lowered[:1] == ["select"] and "join" in lowered[:-1]:
+        tables.add(words[lowered.index("join") + 1])
+    return sorted(tables)
+
+
+def execute_line(user_input: str) -> bool:
+    """
+    Run one command against the session catalog; False means exit.
+    The command holds the catalog lock and the locks of its tables for
+    its whole run, shared for reads and exclusive for writes.
+    """
+    mode, table_name = classify_command(user_input)
+    words = user_input.split(None, 1)
+    command = words[0].lower() if words else ""
+    command = command if command in COMMAND_NAMES else "other"
+    labels = {"command": command, "table": table_name}
+    inc("commands_total", **labels)
+    with PROFILER.sample(), timed("command_seconds", **labels):
+        with catalog_lock(exclusive=mode == "catalog"), ExitStack() as stack:
+            metadata = CATALOG.metadata()
+            for table in command_tables(user_input):
+                # an unknown table is not locked: the command prints an error
+                if table in metadata:
+                    stack.enter_context(table_lock(table, exclusive=mode == "write"))
+            return _dispatch(user_input)
+
+
+def _dispatch(user_input: str) -> bool:
+    user_input = user_input.strip()
+    if not user_input:
+        return True
+
+    if user_input == "exit":
+        return False
+
+    if user_input == "help":
+        print_help()
+        return True
+
+    if user_input == "cache_stats":
+        _print_cache_stats()
+        return True
+
+    if user_input == "lock_stats":
+        _print_lock_stats()
+        return True
+
+    words = user_input.split()
+    if words[0] in ("stats", "profile", "memtrace"):
+        try:
+            _instrumentation(words)
+        except OSError as e:
+            print(f"Ошибка: {e}")
+        return True
+
+    if user_input in ("begin", "commit", "rollback"):
+        _transaction(user_input)
+        return True
+
+    command = user_input.split(None, 1)[0]
+    if command in _NO_TRANSACTION and CATALOG.in_transaction():
+        print(f"Ошибка: Команда {command} недоступна внутри транзакции.")
+        return True
+
+    words = user_input.split()
+    if len(words) == 2 and words[0] in ("format", "pager"):
+        choices = OUTPUT_FORMATS if words[0] == "format" else ("on", "off")
+        if words[1] not in choices:
+            print(f"Некорректное значение: {words[1]}. Попробуйте снова.")
+        elif words[0] == "format":
+            output_settings()["format"] = words[1]
+        else:
+            output_settings()["pager"] = words[1] == "on"
+        return True
+
+    metadata = CATALOG.metadata()
+    try:
+        plan = _compile(user_input, metadata)
+    except ValueError as e:
+        print(str(e))
+        return True
+    if plan is not None:
+        run_plan(plan)
+        return True
+
+    try:
+        args = shlex.split(user_input)
+    except ValueError:
+        print(f"Некорректное значение: {user_input}. Попробуйте снова.")
+        return True
+
+    if not args:
+        return True
+
+    cmd = args[0]
+
+    # ---------- TABLES ----------
+    if cmd == "create_table":
+        if len(args) < 3:
+            print(f"Некорректное значение: {user_input}. Попробуйте снова.")
+            return True
+
+        table_name = args[1]
+        raw_cols = args[2:]
+
+        columns: list[tuple[str, str]] = []
+        ok = True
+        for part in raw_cols:
+            if ":" not in part:
+                print(f"Некорректное значение: {part}. Попробуйте снова.")
+                ok = False
+                break
+            name, typ = part.split(":", 1)
+            name = name.strip()
+            typ = typ.strip()
+            if not name or not typ:
+                print(f"Некорректное значение: {part}. Попробуйте снова.")
+                ok = False
+                break
+            columns.append((name, typ))
+
+        if not ok:
+            return True
+
+        new_meta = create_table(metadata, table_name, columns)
+        CATALOG.save_metadata(new_meta)
+        return True
+
+    if cmd == "list_tables":
+        list_tables(metadata)
+        return True
+
+    if cmd == "drop_table":
+        if len(args) != 2:
+            print(f"Некорректное значение: {user_input}. Попробуйте снова.")
+            return True
+        table_name = args[1]
+        new_meta = drop_table(metadata, table_name)
+        CATALOG.save_metadata(new_meta)
+        CATALOG.forget(table_name)
+        return True
+
+    if cmd == "create_index":
+        if len(args) not in (3, 4) or args[3:] not in ([], ["hash"], ["sorted"]):
+            print(f"Некорректное значение: {user_input}. Попробуйте снова.")
+            return True
+        table_name, col = args[1], args[2]
+        kind = args[3] if len(args) == 4 else "hash"
+        if table_name not in metadata:
+            print(f'Ошибка: Таблица "{table_name}" не существует.')
+            return True
+        if col not in {c["name"] for c in metadata[table_name]}:
+            print(f"Ошибка: Таблица или столбец {col} не найден.")
+            return True
+        CATALOG.create_index(table_name, col, kind)
+        print(f'Индекс по столбцу "{col}" таблицы "{table_name}" создан.')
+        return True
+
+    if cmd == "vacuum":
+        if len(args) != 2:
+            print(f"Некорректное значение: {user_input}. Попробуйте снова.")
+            return True
+        table_name = args[1]
+        if table_name not in metadata:
+            print(f'Ошибка: Таблица "{table_name}" не существует.')
+            return True
+        CATALOG.flush()
+        with timed("phase_seconds", phase="save", table=table_name):
+            count = vacuum_table(table_name)
+        print(f'Таблица "{table_name}" очищена, освобождено записей: {count}.')
+        return True
+
+    # ---------- FILES ----------
+    if (
+        len(args) >= 4
+        and args[0] == "export"
+        and args[2] == "to"
+        and (len(args) == 4 or args[4].lower() == "where")
+    ):
+        where_text = ""
+        if len(args) > 4:
+            idx = find_keyword(user_input, "where")
+            where_text = user_input[idx + len("where") :].strip()
+        try:
+            _export(metadata, args[1], args[3], where_text)
+        except ValueError as e:
+            print(str(e))
+        except OSError as e:
+            print(f"Ошибка: {e}")
+        return True
+
+    if len(args) == 4 and args[0] == "import" and args[2] == "into":
+        _import(metadata, args[3], args[1])
+        return True
+
+    if len(args) == 4 and args[0] == "load" and args[2] == "from":
+        table_name, path = args[1], args[3]
+        if table_name not in metadata:
+            print(f'Ошибка: Таблица "{table_name}" не существует.')
+            return True
+        cols = [c["name"] for c in metadata[table_name] if c["name"] != "ID"]
+        try:
+            records = read_rows_file(path)
+            rows_raw = [[rec[c] for c in cols] for rec in records]
+        except FileNotFoundError:
+            print(f"Ошибка: Файл {path} не найден.")
+            return True
+        except KeyError as e:
+            print(f"Ошибка: Таблица или столбец {e.args[0]} не найден.")
+            return True
+        except ValueError as e:
+            print(str(e))
+            return True
+        _bulk_insert(metadata, table_name, rows_raw)
+        return True
+
+    # ---------- PREPARED ----------
+    if cmd == "prepare":
+        parts = user_input.split(None, 3)
+        if len(parts) != 4 or parts[2].lower() != "as":
+            print(f"Некорректное значение: {user_input}. Попробуйте снова.")
+            return True
+        try:
+            _prepare(parts[1], parts[3], metadata)
+        except ValueError as e:
+            print(str(e))
+            return True
+        print(f'Запрос "{parts[1]}" подготовлен.')
+        return True
+
+    if cmd == "execute":
+        parts = user_input.split(None, 2)
+        if len(parts) < 2:
+            print(f"Некорректное значение: {user_input}. Попробуйте снова.")
+            return True
+        try:
+            values = parse_values(parts[2]) if len(parts) == 3 else []
+            plan = _prepared(parts[1], metadata).bind(values)
+        except ValueError as e:
+            print(str(e))
+            return True
+        run_plan(plan)
+        return True
+
+    print(f"Функции {cmd} нет. Попробуйте снова.")
+    return True
+
+
+def shutdown() -> None:
+    """
+    Flush deferred writes, sync the log and stop scan workers. A
+    transaction still open is rolled back.
+    """
+    with catalog_lock():
+        if CATALOG.in_transaction():
+            CATALOG.rollback()
+            print("Транзакция не зафиксирована, изменения отменены.")
+        CATALOG.flush()
+    sync_storage()
+    SCAN_POOL.close()
+
+
+def _statements(lines: Iterable[str]) -> Iterator[str]:
+    """Commands of a script: one per line, '--'/'#' comments, optional ';'."""
+    for line in lines:
+        line = line.strip()
+        if line.startswith(("--", "#")):
             continue
+        line = line.removesuffix(";").strip()
+        if line:
+            yield line
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
 
-        print(f"Функции {cmd} нет. Попробуйте снова.")
 
+def run_script(lines: Iterable[str], timing: bool = False) -> None:
+    """
+    Execute commands back to back in this process, so tables, indexes and
+    caches stay warm between statements. With timing, per-statement latency
+    and a summary go to stderr, keeping stdout clean for results.
+    """
+    configure()
+    recover_storage()
+    OUTPUT["pager"] = False
+    elapsed: list[float] = []
+    try:
+        for statement in _statements(lines):
+            CATALOG.maybe_flush()
+            start = time.perf_counter()
+            running = execute_line(statement)
+            elapsed.append(time.perf_counter() - start)
+            if timing:
+                print(f"[{elapsed[-1] * 1000:9.3f} мс] {statement}", file=sys.stderr)
+            if not running:
+                break
+    finally:
+        shutdown()
+
+    if timing and elapsed:
+        ordered = sorted(elapsed)
+        print(
+            f"Выполнено команд: {len(elapsed)}, всего {sum(elapsed):.3f} с, "
+            f"среднее {sum(elapsed) / len(elapsed) * 1000:.3f} мс, "
+            f"p50 {_percentile(ordered, 0.5) * 1000:.3f} мс, "
+            f"p95 {_percentile(ordered, 0.95) * 1000:.3f} мс, "
+            f"макс {ordered[-1] * 1000:.3f} мс",
+            file=sys.stderr,
+        )
+
+
+def welcome() -> None:
+    print("\n***База данных***")
+    configure()
+    recover_storage()
+    print_help()
+
+    while True:
+        CATALOG.maybe_flush()
+        user_input = prompt.string(">>>Введите команду: ")
+        if not execute_line(user_input):
+            shutdown()
+            return
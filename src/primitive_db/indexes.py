@@ -0,0 +1,111 @@
+from bisect import bisect_left, bisect_right, insort
+from operator import itemgetter
+
+from src.primitive_db.rows import column_values
+
+_value = itemgetter(0)
+
+
+class SortedIndex:
+    """
+    Sorted (value, id) entries of a column: O(log n) seeks for equality
+    and ranges, and in-order iteration for ORDER BY.
+    """
+
+    def __init__(self, entries: list[tuple] | None = None) -> None:
+        self.entries: list[tuple] = entries or []
+
+    @classmethod
+    def build(cls, table_data: list[dict], col: str) -> "SortedIndex":
+        values = column_values(table_data, col)
+        return cls(sorted(zip(values, column_values(table_data, "ID"))))
+
+    def add(self, value, row_id: int) -> None:
+        insort(self.entries, (value, row_id))
+
+    def remove(self, value, row_id: int) -> None:
+        pos = bisect_left(self.entries, (value, row_id))
+        if pos < len(self.entries) and self.entries[pos] == (value, row_id):
+            del self.entries[pos]
+
+    def get(self, value, default=None):
+        ids = self.range(value, True, value, True)
+        return ids if ids else default
+
+    def range(self, low=None, low_incl=True, high=None, high_incl=True) -> list[int]:
+        """IDs with low <(=) value <(=) high in value order; None is unbounded."""
+        entries = self.entries
+        start, end = 0, len(entries)
+        if low is not None:
+            find = bisect_left if low_incl else bisect_right
+            start = find(entries, low, key=_value)
+        if high is not None:
+            find = bisect_right if high_incl else bisect_left
+            end = find(entries, high, key=_value)
+        return [row_id for _, row_id in entries[start:end]]
+
+    def ids(self, descending: bool = False):
+        """All IDs in value order."""
+        entries = reversed(self.entries) if descending else self.entries
+        return (row_id for _, row_id in entries)
+
+
+def build_index(table_data: list[dict], col: str) -> dict:
+    """Build hash index {value: [ids]} for column."""
+    index: dict = {}
+    for value, row_id in zip(column_values(table_data, col),
+                             column_values(table_data, "ID")):
+        index.setdefault(value, []).append(row_id)
+    return index
+
+
+def index_add(index: dict | SortedIndex, value, row_id: int) -> None:
+    if isinstance(index, SortedIndex):
+        index.add(value, row_id)
+        return
+    index.setdefault(value, []).append(row_id)
+
+
+def index_remove(index: dict | SortedIndex, value, row_id: int) -> None:
+    if isinstance(index, SortedIndex):
+        index.remove(value, row_id)
+        return
+    ids = index.get(value)
+    if not ids:
+        return
+    try:
+        ids.remove(row_id)
+    except ValueError:
+        return
+    if not ids:
+        del index[value]
+
+
+def locate_rows(table_data: list[dict], ids: list[int]) -> list[int]:
+    """
+    Positions of rows with given IDs, found by binary search on ID (rows
+    are kept in ID order). IDs with no row, e.g. deleted ones, are skipped.
+    """
+    positions: list[int] = []
+    for row_id in ids:
+        pos = bisect_left(table_data, row_id, key=lambda r: r["ID"])
+        if pos < len(table_data) and table_data[pos]["ID"] == row_id:
+            positions.append(pos)
+    return positions
+
+
+def id_range(table_data: list[dict],
+             low=None,
+             low_incl: bool = True,
+             high=None,
+             high_incl: bool = True,
+) -> range:
+    """Positions of rows with ID in the given bounds (rows are in ID order)."""
+    start, end = 0, len(table_data)
+    if low is not None:
+        find = bisect_left if low_incl else bisect_right
+        start = find(table_data, low, key=lambda r: r["ID"])
+    if high is not None:
+        find = bisect_right if high_incl else bisect_left
+        end = find(table_data, high, key=lambda r: r["ID"])
+    return range(start, max(start, end))
@@ -0,0 +1,69 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # no flock (Windows): locking is a no-op there
+    fcntl = None
+
+LOCK_MODES = ("shared", "exclusive")
+LOCK_STATS = {
+    mode: {"acquired": 0, "contended": 0, "wait_total": 0.0, "wait_max": 0.0}
+    for mode in LOCK_MODES
+}
+_stats_lock = threading.Lock()
+_held = threading.local()
+
+
+def _record(mode: str, contended: bool, waited: float) -> None:
+    with _stats_lock:
+        stats = LOCK_STATS[mode]
+        stats["acquired"] += 1
+        if contended:
+            stats["contended"] += 1
+            stats["wait_total"] += waited
+            stats["wait_max"] = max(stats["wait_max"], waited)
+
+
+@contextmanager
+def file_lock(path: str, exclusive: bool = False):
+    """
+    Hold a shared or exclusive flock on path for the with-block. Locks are
+    per open file, so threads and processes exclude each other alike; a
+    thread that already holds path does not lock it again. Asking for an
+    exclusive lock while holding a shared one raises RuntimeError: the
+    upgrade could not be made atomically. Time spent waiting for another
+    holder is counted in LOCK_STATS.
+    """
+    held = _held.__dict__.setdefault("paths", {})  # path -> exclusive
+    if fcntl is None:
+        yield
+        return
+    if path in held:
+        if exclusive and not held[path]:
+            raise RuntimeError(f"shared lock of {path} cannot be upgraded")
+        yield
+        return
+
+    mode = LOCK_MODES[exclusive]
+    flag = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        start = time.perf_counter()
+        try:
+            fcntl.flock(fd, flag | fcntl.LOCK_NB)
+            contended = False
+        except BlockingIOError:
+            fcntl.flock(fd, flag)
+            contended = True
+        _record(mode, contended, time.perf_counter() - start)
+        held[path] = exclusive
+        try:
+            yield
+        finally:
+            del held[path]
+            fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
@@ -1,13 +1,91 @@
 #!/usr/bin/env python3
 
-from src.primitive_db.engine import welcome
+import argparse
+import sys
+
+from src.primitive_db.bench import BENCH_SIZES, run_bench
+from src.primitive_db.client import run_client
+from src.primitive_db.decorators import CONFIRM
+from src.primitive_db.engine import run_script, welcome
+from src.primitive_db.server import DEFAULT_HOST, DEFAULT_PORT, serve
 
 
 def main() -> None:
     """Entry point."""
-    welcome()
+    parser = argparse.ArgumentParser(prog="project", description="Primitive DB")
+    parser.add_argument(
+        "--script",
+        metavar="FILE",
+        help="выполнить команды из файла (- для stdin) без интерактивного режима",
+    )
+    parser.add_argument(
+        "-y",
+        "--yes",
+        action="store_true",
+        help="не запрашивать подтверждение опасных операций",
+    )
+    parser.add_argument(
+        "--timing",
+        action="store_true",
+        help="время каждой команды и итоговая сводка (в stderr)",
+    )
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--serve",
+        action="store_true",
+        help="запустить TCP-сервер с общей копией таблиц в памяти",
+    )
+    mode.add_argument(
+        "--connect",
+        action="store_true",
+        help="подключиться к запущенному серверу",
+    )
+    mode.add_argument(
+        "--bench",
+        action="store_true",
+        help="прогнать бенчмарк CRUD на синтетических таблицах, отчёт в JSON",
+    )
+    parser.add_argument(
+        "--rows",
+        default=",".join(str(n) for n in BENCH_SIZES),
+        help="размеры таблиц для --bench через запятую",
+    )
+    parser.add_argument("--out", metavar="FILE", help="куда записать отчёт --bench")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+
+    if args.bench:
+        try:
+            sizes = [int(n) for n in args.rows.split(",")]
+        except ValueError:
+            print(f"Некорректное значение: {args.rows}. Попробуйте снова.")
+            sys.exit(1)
+        run_bench(sizes, args.out)
+        return
+    if args.serve:
+        serve(args.host, args.port)
+        return
+    if args.connect:
+        run_client(args.host, args.port)
+        return
+    if args.script is None:
+        welcome()
+        return
+
+    CONFIRM["assume_yes"] = args.yes
+    if args.script == "-":
+        CONFIRM["stdin_answers"] = False
+        run_script(sys.stdin, timing=args.timing)
+        return
+    try:
+        script = open(args.script, encoding="utf-8")
+    except FileNotFoundError:
+        print(f"Ошибка: Файл {args.script} не найден.")
+        sys.exit(1)
+    with script:
+        run_script(script, timing=args.timing)
 
 
 if __name__ == "__main__":
     main()
-
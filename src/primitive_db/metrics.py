@@ -0,0 +1,215 @@
+import cProfile
+import io
+import pstats
+import threading
+import time
+import tracemalloc
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+
+# latency histogram bucket upper bounds, seconds
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+PROFILE_EVERY = 10  # while profiling, profile one command in this many
+PREFIX = "primitive_db"
+
+_lock = threading.Lock()
+_counters: dict[tuple[str, tuple], float] = {}
+_histograms: dict[tuple[str, tuple], list] = {}
+
+
+def _key(name: str, labels: dict) -> tuple[str, tuple]:
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name: str, value: float = 1, **labels) -> None:
+    """Add value to a labelled counter."""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name: str, seconds: float, **labels) -> None:
+    """Record one latency sample into a labelled histogram."""
+    key = _key(name, labels)
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            # [count, sum, per-bucket counts (last one is +Inf)]
+            hist = _histograms[key] = [0, 0.0, [0] * (len(LATENCY_BUCKETS) + 1)]
+        hist[0] += 1
+        hist[1] += seconds
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                hist[2][i] += 1
+                break
+        else:
+            hist[2][-1] += 1
+
+
+@contextmanager
+def timed(name: str, **labels):
+    """Observe the duration of the with-block."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def timed_iter(rows: Iterable, name: str, **labels) -> Iterator:
+    """
+    Pass rows through, observing only the time spent producing them (not
+    the consumer's time between items) once the iterator is exhausted.
+    """
+    it = iter(rows)
+    spent = 0.0
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            finally:
+                spent += time.perf_counter() - start
+            yield item
+    finally:
+        observe(name, spent, **labels)
+
+
+def reset() -> None:
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def _quantile(hist: list, q: float) -> float:
+    """Upper bucket bound below which q of the samples fall."""
+    target = q * hist[0]
+    seen = 0
+    for i, count in enumerate(hist[2]):
+        seen += count
+        if seen >= target and count:
+            return LATENCY_BUCKETS[i] if i < len(LATENCY_BUCKETS) else float("inf")
+    return 0.0
+
+
+def _copy() -> tuple[list, list]:
+    """Consistent sorted copies of counters and histograms."""
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = [(k, [v[0], v[1], list(v[2])]) for k, v in _histograms.items()]
+    return counters, sorted(histograms)
+
+
+def _labels_text(labels: tuple) -> str:
+    return ", ".join(f"{k}={v}" for k, v in labels if v != "")
+
+
+def render_text() -> str:
+    """Human-readable dump of all counters and histograms."""
+    counters, histograms = _copy()
+    lines = ["Счётчики:"]
+    for (name, labels), value in counters:
+        lines.append(f"  {name} {{{_labels_text(labels)}}}: {value:g}")
+    lines.append("Задержки (мс: всего, среднее, ~p50, ~p99):")
+    for (name, labels), hist in histograms:
+        mean = hist[1] / hist[0] if hist[0] else 0.0
+        lines.append(
+            f"  {name} {{{_labels_text(labels)}}}: {hist[0]}, "
+            f"{mean * 1000:.3f}, {_quantile(hist, 0.5) * 1000:g}, "
+            f"{_quantile(hist, 0.99) * 1000:g}"
+        )
+    return "\n".join(lines)
+
+
+def _prom_labels(labels: tuple, extra: str = "") -> str:
+    parts = [f'{k}="{v}"' for k, v in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def render_prometheus() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    counters, histograms = _copy()
+    lines: list[str] = []
+    typed: set[str] = set()
+    for (name, labels), value in counters:
+        metric = f"{PREFIX}_{name}"
+        if metric not in typed:
+            lines.append(f"# TYPE {metric} counter")
+            typed.add(metric)
+        lines.append(f"{metric}{_prom_labels(labels)} {value:g}")
+    for (name, labels), hist in histograms:
+        metric = f"{PREFIX}_{name}"
+        if metric not in typed:
+            lines.append(f"# TYPE {metric} histogram")
+            typed.add(metric)
+        cumulative = 0
+        bounds = [f"{b:g}" for b in LATENCY_BUCKETS] + ["+Inf"]
+        for bound, count in zip(bounds, hist[2]):
+            cumulative += count
+            le = _prom_labels(labels, f'le="{bound}"')
+            lines.append(f"{metric}_bucket{le} {cumulative}")
+        lines.append(f"{metric}_sum{_prom_labels(labels)} {hist[1]:.9f}")
+        lines.append(f"{metric}_count{_prom_labels(labels)} {hist[0]}")
+    return "\n".join(lines) + "\n"
+
+
+class SamplingProfiler:
+    """cProfile over one command in every `every` while enabled."""
+
+    def __init__(self, every: int = PROFILE_EVERY) -> None:
+        self.every = every
+        self.enabled = False
+        self._seen = 0
+        self._profile = cProfile.Profile()
+        self._sampled = 0
+
+    @contextmanager
+    def sample(self):
+        self._seen += 1
+        if not self.enabled or self._seen % self.every:
+            yield
+            return
+        try:
+            self._profile.enable()
+        except ValueError:
+            # another thread is being profiled right now
+            yield
+            return
+        try:
+            yield
+        finally:
+            self._profile.disable()
+            self._sampled += 1
+
+    def reset(self) -> None:
+        self._profile = cProfile.Profile()
+        self._sampled = 0
+
+    def report(self, limit: int = 15) -> str:
+        if not self._sampled:
+            return "Профиль пуст."
+        out = io.StringIO()
+        stats = pstats.Stats(self._profile, stream=out)
+        stats.sort_stats("cumulative").print_stats(limit)
+        return f"Команд в профиле: {self._sampled}\n{out.getvalue().strip()}"
+
+    def dump(self, path: str) -> None:
+        self._profile.dump_stats(path)
+
+
+PROFILER = SamplingProfiler()
+
+
+def memory_report(limit: int = 10) -> str:
+    """Traced memory and top allocation sites, if tracemalloc is running."""
+    if not tracemalloc.is_tracing():
+        return "Трассировка памяти выключена (memtrace on)."
+    current, peak = tracemalloc.get_traced_memory()
+    lines = [f"Память: текущая {current / 2**20:.1f} МБ, пик {peak / 2**20:.1f} МБ"]
+    top = tracemalloc.take_snapshot().statistics("lineno")[:limit]
+    lines += [f"  {stat}" for stat in top]
+    return "\n".join(lines)
@@ -0,0 +1,40 @@
+import multiprocessing
+import os
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+
+
+class ScanPool:
+    """
+    Process pool for full-table WHERE scans. Tables with at least min_rows
+    rows are split into one segment per worker; each worker filters its
+    segment and results come back in segment (ID) order. The pool is
+    started on first use.
+    """
+
+    def __init__(self, workers: int | None = None, min_rows: int = 200_000) -> None:
+        self.workers = workers if workers is not None else os.cpu_count() or 1
+        self.min_rows = min_rows
+        self._executor: ProcessPoolExecutor | None = None
+
+    def segments(self, size: int) -> list[tuple[int, int]] | None:
+        """(start, end) bounds per worker, or None if a serial scan is better."""
+        if self.workers < 2 or size < self.min_rows:
+            return None
+        step = -(-size // self.workers)
+        return [(start, min(start + step, size)) for start in range(0, size, step)]
+
+    def map(self, fn: Callable, tasks: list[tuple]) -> list:
+        if self._executor is None:
+            # spawn, not fork: the log storage runs background sync threads
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        futures = [self._executor.submit(fn, *task) for task in tasks]
+        return [f.result() for f in futures]
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
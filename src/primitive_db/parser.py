@@ -64,3 +64,292 @@ def parse_clause(text: str) -> dict[str, str]:
         raise ValueError(f"Некорректное значение: {text}. Попробуйте снова.")
     return {col: val}
 
+
+def _split_groups(text: str) -> list[str]:
+    groups: list[str] = []
+    depth = 0
+    start = 0
+    in_quotes = False
+
+    for i, ch in enumerate(text):
+        if ch == '"':
+            in_quotes = not in_quotes
+        elif in_quotes:
+            continue
+        elif ch == "(":
+            if depth == 0:
+                start = i
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+            if depth == 0:
+                groups.append(text[start : i + 1])
+            if depth < 0:
+                break
+        elif depth == 0 and ch not in ", \t":
+            raise ValueError(f"Некорректное значение: {text}. Попробуйте снова.")
+
+    if depth != 0 or in_quotes or not groups:
+        raise ValueError(f"Некорректное значение: {text}. Попробуйте снова.")
+    return groups
+
+
+def parse_values_list(values_part: str) -> list[list[str]]:
+    """Parse '(...), (...), ...' into a list of raw value lists."""
+    return [parse_values(group) for group in _split_groups(values_part)]
+
+
+CONDITION_OPS = {"=", "<", "<=", ">", ">="}
+
+
+_PUNCTUATION = "(),"
+_OPERATOR_CHARS = "=<>!"
+_WORD_END = '"' + _PUNCTUATION + _OPERATOR_CHARS
+
+
+def _where_tokens(text: str) -> list[tuple[str, bool]]:
+    """Split WHERE text into (token, quoted) pairs; quotes are removed."""
+    tokens: list[tuple[str, bool]] = []
+    i = 0
+    while i < len(text):
+        ch = text[i]
+        if ch.isspace():
+            i += 1
+        elif ch == '"':
+            end = text.find('"', i + 1)
+            if end == -1:
+                raise ValueError(f"Некорректное значение: {text}. Попробуйте снова.")
+            tokens.append((text[i + 1 : end], True))
+            i = end + 1
+        elif ch in _PUNCTUATION:
+            tokens.append((ch, False))
+            i += 1
+        else:
+            stop = i + 1
+            if ch in _OPERATOR_CHARS:
+                while stop < len(text) and text[stop] in _OPERATOR_CHARS:
+                    stop += 1
+            else:
+                while stop < len(text) and not (
+                    text[stop].isspace() or text[stop] in _WORD_END
+                ):
+                    stop += 1
+            tokens.append((text[i:stop], False))
+            i = stop
+    return tokens
+
+
+class _WhereParser:
+    """
+    Recursive descent over WHERE tokens:
+        expr := and_expr (OR and_expr)*
+        and_expr := not_expr (AND not_expr)*
+        not_expr := NOT not_expr | ( expr ) | comparison
+        comparison := col <op> value | col BETWEEN value AND value
+                    | col [NOT] IN ( value, ... )
+    """
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self.tokens = _where_tokens(text)
+        self.pos = 0
+
+    def error(self) -> ValueError:
+        return ValueError(f"Некорректное значение: {self.text}. Попробуйте снова.")
+
+    def keyword(self) -> str | None:
+        """Next unquoted token in lower case, None for a quoted one or the end."""
+        if self.pos < len(self.tokens):
+            token, quoted = self.tokens[self.pos]
+            if not quoted:
+                return token.lower()
+        return None
+
+    def take(self) -> tuple[str, bool]:
+        if self.pos >= len(self.tokens):
+            raise self.error()
+        self.pos += 1
+        return self.tokens[self.pos - 1]
+
+    def expect(self, word: str) -> None:
+        if self.keyword() != word:
+            raise self.error()
+        self.pos += 1
+
+    def parse(self) -> tuple:
+        node = self.expr()
+        if self.pos != len(self.tokens):
+            raise self.error()
+        return node
+
+    def expr(self) -> tuple:
+        parts = [self.and_expr()]
+        while self.keyword() == "or":
+            self.pos += 1
+            parts.append(self.and_expr())
+        return parts[0] if len(parts) == 1 else ("or", tuple(parts))
+
+    def and_expr(self) -> tuple:
+        parts = [self.not_expr()]
+        while self.keyword() == "and":
+            self.pos += 1
+            parts.append(self.not_expr())
+        return parts[0] if len(parts) == 1 else ("and", tuple(parts))
+
+    def not_expr(self) -> tuple:
+        if self.keyword() == "not":
+            self.pos += 1
+            return ("not", self.not_expr())
+        if self.keyword() == "(":
+            self.pos += 1
+            node = self.expr()
+            self.expect(")")
+            return node
+        return self.comparison()
+
+    def comparison(self) -> tuple:
+        col, quoted = self.take()
+        if quoted or col in _PUNCTUATION:
+            raise self.error()
+        op = self.keyword()
+        self.pos += 1
+        if op == "between":
+            low = self.value()
+            self.expect("and")
+            return col, op, [low, self.value()]
+        negate = op == "not"
+        if negate:
+            op = self.keyword()
+            self.pos += 1
+        if op == "in":
+            self.expect("(")
+            values = [self.value()]
+            while self.keyword() == ",":
+                self.pos += 1
+                values.append(self.value())
+            self.expect(")")
+            node = (col, op, values)
+            return ("not", node) if negate else node
+        if op in ("!=", "<>") and not negate:
+            return ("not", (col, "=", [self.value()]))
+        if op not in CONDITION_OPS or negate:
+            raise self.error()
+        return col, op, [self.value()]
+
+    def value(self) -> str:
+        token, quoted = self.take()
+        if quoted:
+            return token
+        if token in _PUNCTUATION or token[0] in _OPERATOR_CHARS:
+            raise self.error()
+        # unquoted words up to the next keyword form one value
+        words = [token]
+        while self.pos < len(self.tokens):
+            token, quoted = self.tokens[self.pos]
+            if (
+                quoted
+                or token in _PUNCTUATION
+                or token[0] in _OPERATOR_CHARS
+                or token.lower() in ("and", "or")
+            ):
+                break
+            words.append(token)
+            self.pos += 1
+        return " ".join(words)
+
+
+def parse_where(text: str) -> tuple:
+    """
+    Parse a WHERE expression with AND/OR/NOT, parentheses, comparisons,
+    BETWEEN and [NOT] IN lists into a tree of raw values: leaves are
+    (col, op, [raw values]), nodes are ("and" | "or", (children, ...)) and
+    ("not", child). != and <> become NOT =.
+    """
+    return _WhereParser(text.strip()).parse()
+
+
+def find_keyword(text: str, keyword: str) -> int:
+    """Index of keyword as a separate word outside double quotes, or -1."""
+    low = text.lower()
+    end = len(keyword)
+    in_quotes = False
+    for i, ch in enumerate(text):
+        if ch == '"':
+            in_quotes = not in_quotes
+        elif (
+            not in_quotes
+            and low.startswith(keyword, i)
+            and (i == 0 or text[i - 1].isspace())
+            and (i + end == len(text) or text[i + end].isspace())
+        ):
+            return i
+    return -1
+
+
+def split_select_tail(
+    text: str,
+) -> tuple[str, tuple[str, bool] | None, int | None, int]:
+    """
+    Split '<where> order by <col> [asc|desc] limit <n> offset <m>' into
+    (where_text, (col, descending) | None, limit | None, offset).
+    """
+    offset = 0
+    idx = find_keyword(text, "offset")
+    if idx != -1:
+        tail = text[idx + len("offset") :].split()
+        if len(tail) != 1 or not tail[0].isdigit():
+            raise ValueError(f"Некорректное значение: {text}. Попробуйте снова.")
+        offset = int(tail[0])
+        text = text[:idx]
+
+    limit = None
+    idx = find_keyword(text, "limit")
+    if idx != -1:
+        tail = text[idx + len("limit") :].split()
+        if len(tail) != 1 or not tail[0].isdigit():
+            raise ValueError(f"Некорректное значение: {text}. Попробуйте снова.")
+        limit = int(tail[0])
+        text = text[:idx]
+
+    order_by = None
+    idx = find_keyword(text, "order by")
+    if idx != -1:
+        tail = text[idx + len("order by") :].split()
+        direction = tail[1].lower() if len(tail) == 2 else "asc"
+        if len(tail) not in (1, 2) or direction not in ("asc", "desc"):
+            raise ValueError(f"Некорректное значение: {text}. Попробуйте снова.")
+        order_by = (tail[0], direction == "desc")
+        text = text[:idx]
+
+    return text.strip(), order_by, limit, offset
+
+
+AGGREGATE_FUNCS = {"count", "sum", "min", "max", "avg"}
+
+
+def parse_projection(text: str) -> list[tuple[str | None, str | None]]:
+    """
+    Parse 'name, count(*), max(age)' into [(None, "name"), ("count", None),
+    ("max", "age")]: (func, col) per item, func None for a plain column
+    and col None for *.
+    """
+    items: list[tuple[str | None, str | None]] = []
+    for part in text.split(","):
+        part = part.strip()
+        if "(" not in part:
+            if not part.isidentifier():
+                raise ValueError(f"Некорректное значение: {part}. Попробуйте снова.")
+            items.append((None, part))
+            continue
+        func, _, arg = part.partition("(")
+        func, arg = func.strip().lower(), arg.strip()
+        if func not in AGGREGATE_FUNCS or not arg.endswith(")"):
+            raise ValueError(f"Некорректное значение: {part}. Попробуйте снова.")
+        col = arg[:-1].strip()
+        if col == "*" and func == "count":
+            items.append((func, None))
+        elif col.isidentifier():
+            items.append((func, col))
+        else:
+            raise ValueError(f"Некорректное значение: {part}. Попробуйте снова.")
+    return items
@@ -0,0 +1,334 @@
+from src.primitive_db.core import aggregate_label, cast_value, map_conditions
+from src.primitive_db.parser import (
+    find_keyword,
+    parse_clause,
+    parse_projection,
+    parse_values_list,
+    parse_where,
+    split_select_tail,
+)
+
+_MARK = "\x00"
+
+
+class Param:
+    """Placeholder slot in a prepared statement."""
+
+    __slots__ = ("index",)
+
+    def __init__(self, index: int) -> None:
+        self.index = index
+
+
+class Plan:
+    """
+    Compiled DML statement: table and columns resolved against the schema,
+    literals already cast to column types. Plans with placeholders are
+    filled in by bind().
+    """
+
+    __slots__ = (
+        "kind",
+        "table",
+        "schema",
+        "rows_raw",
+        "set_clause",
+        "where",
+        "order_by",
+        "limit",
+        "offset",
+        "aggregates",
+        "group_by",
+        "projection",
+        "join",
+        "param_types",
+    )
+
+    def __init__(self, kind: str, table: str, schema: list[dict]) -> None:
+        self.kind = kind
+        self.table = table
+        self.schema = schema
+        self.rows_raw: list[list] = []
+        self.set_clause: dict = {}
+        self.where: tuple | None = None
+        self.order_by: tuple[str, bool] | None = None
+        self.limit: int | None = None
+        self.offset = 0
+        # aggregate select: [(func, col | None)], GROUP BY column and
+        # output column names in select-list order
+        self.aggregates: list[tuple[str, str | None]] = []
+        self.group_by: str | None = None
+        self.projection: list[str] = []
+        # join: (right table, left column, right column); where and
+        # order_by columns are then qualified as "<table>.<col>"
+        self.join: tuple[str, str, str] | None = None
+        self.param_types: list[str | None] = []
+
+    def bind(self, values: list[str]) -> "Plan":
+        """Copy of the plan with placeholders replaced by cast values."""
+        if len(values) != len(self.param_types):
+            raise ValueError(
+                f"Некорректное значение: ожидается {len(self.param_types)} значений. "
+                "Попробуйте снова."
+            )
+        typed = [
+            raw if typ is None else cast_value(raw, typ)
+            for raw, typ in zip(values, self.param_types)
+        ]
+
+        def sub(value):
+            return typed[value.index] if isinstance(value, Param) else value
+
+        bound = Plan(self.kind, self.table, self.schema)
+        bound.rows_raw = [[sub(v) for v in row] for row in self.rows_raw]
+        bound.set_clause = {k: sub(v) for k, v in self.set_clause.items()}
+        if self.where is not None:
+
+            def bind_leaf(leaf: tuple) -> tuple:
+                col, op, val = leaf
+                if op in ("between", "in"):
+                    return col, op, tuple(sub(v) for v in val)
+                return col, op, sub(val)
+
+            bound.where = map_conditions(self.where, bind_leaf)
+        bound.order_by = self.order_by
+        bound.limit = self.limit
+        bound.offset = self.offset
+        bound.aggregates = self.aggregates
+        bound.group_by = self.group_by
+        bound.projection = self.projection
+        bound.join = self.join
+        return bound
+
+
+def normalize(text: str) -> str:
+    """Collapse runs of whitespace outside double quotes (plan cache key)."""
+    out: list[str] = []
+    in_quotes = False
+    prev_space = False
+    for ch in text.strip():
+        if ch == '"':
+            in_quotes = not in_quotes
+        if not in_quotes and ch.isspace():
+            if not prev_space:
+                out.append(" ")
+            prev_space = True
+            continue
+        prev_space = False
+        out.append(ch)
+    return "".join(out)
+
+
+def _mark_placeholders(text: str) -> str:
+    """Replace unquoted '?' with numbered markers the parsers pass through."""
+    out: list[str] = []
+    in_quotes = False
+    count = 0
+    for ch in text:
+        if ch == '"':
+            in_quotes = not in_quotes
+        if ch == "?" and not in_quotes:
+            out.append(f"{_MARK}{count}{_MARK}")
+            count += 1
+        else:
+            out.append(ch)
+    return "".join(out)
+
+
+def _param_index(raw: str) -> int | None:
+    if len(raw) > 2 and raw[0] == _MARK and raw[-1] == _MARK:
+        return int(raw[1:-1])
+    return None
+
+
+class _Compiler:
+    def __init__(self, plan: Plan) -> None:
+        self.plan = plan
+        self.types = {c["name"]: c["type"] for c in plan.schema}
+        self.aliases: dict[str, str] = {}
+        self.slots: dict[int, str | None] = {}
+
+    def value(self, raw: str, col: str | None):
+        """Cast literal to col type; None col keeps raw (insert casts later)."""
+        idx = _param_index(raw)
+        if idx is not None:
+            self.slots[idx] = None if col is None else self.types[col]
+            return Param(idx)
+        return raw if col is None else cast_value(raw, self.types[col])
+
+    def column(self, col: str) -> str:
+        col = self.aliases.get(col, col)
+        if col not in self.types:
+            raise ValueError(f"Ошибка: Таблица или столбец {col} не найден.")
+        return col
+
+    def where(self, text: str) -> tuple:
+        return map_conditions(parse_where(text), self.condition)
+
+    def condition(self, leaf: tuple) -> tuple:
+        """Resolve the column and cast the values of one parsed comparison."""
+        col, op, raw_vals = leaf
+        col = self.column(col)
+        vals = [self.value(raw, col) for raw in raw_vals]
+        return col, op, tuple(vals) if op in ("between", "in") else vals[0]
+
+    def join(self, text: str, metadata: dict) -> None:
+        """
+        Resolve 'join <table> on <col> = <col>'. Columns of both tables
+        become "<table>.<col>"; a bare name is accepted if it is unique.
+        """
+        words = text.replace("=", " = ").split()
+        if (
+            len(words) != 6
+            or words[0].lower() != "join"
+            or words[2].lower() != "on"
+            or words[4] != "="
+        ):
+            raise _bad(text)
+        left, right = self.plan.table, words[1]
+        if right not in metadata:
+            raise ValueError(f'Ошибка: Таблица "{right}" не существует.')
+        if right == left:
+            raise _bad(text)
+        names = [c["name"] for t in (left, right) for c in metadata[t]]
+        self.types = {}
+        for table in (left, right):
+            for c in metadata[table]:
+                qualified = f"{table}.{c['name']}"
+                self.types[qualified] = c["type"]
+                if names.count(c["name"]) == 1:
+                    self.aliases[c["name"]] = qualified
+        a, b = self.column(words[3]), self.column(words[5])
+        if a.startswith(f"{right}."):
+            a, b = b, a
+        if not a.startswith(f"{left}.") or not b.startswith(f"{right}."):
+            raise _bad(text)
+        if self.types[a] != self.types[b]:
+            raise _bad(text)
+        self.plan.join = (right, a[len(left) + 1 :], b[len(right) + 1 :])
+
+    def aggregate(self, projection: str, group_by: str | None) -> None:
+        """Resolve the select list of an aggregate query."""
+        plan = self.plan
+        for func, col in parse_projection(projection):
+            if col is not None:
+                self.column(col)
+            if func is None:
+                if col != group_by:
+                    raise _bad(col)
+                plan.projection.append(col)
+                continue
+            if func in ("sum", "avg") and self.types[col] == "str":
+                raise _bad(aggregate_label(func, col))
+            plan.aggregates.append((func, col))
+            plan.projection.append(aggregate_label(func, col))
+        if not plan.aggregates:
+            raise _bad(projection)
+
+    def finish(self) -> Plan:
+        self.plan.param_types = [self.slots[i] for i in sorted(self.slots)]
+        if sorted(self.slots) != list(range(len(self.slots))):
+            raise ValueError("Некорректное значение: ?. Попробуйте снова.")
+        return self.plan
+
+
+def _bad(text: str) -> ValueError:
+    return ValueError(f"Некорректное значение: {text}. Попробуйте снова.")
+
+
+def compile_statement(text: str, metadata: dict) -> Plan | None:
+    """
+    Compile insert/select/update/delete into a Plan; unquoted '?' becomes
+    a placeholder. Returns None for other commands. Raises ValueError
+    with a user-facing message on errors.
+    """
+    text = _mark_placeholders(normalize(text))
+    words = text.split(" ", 3)
+    head = [w.lower() for w in words[:2]]
+    projection = ""
+    if head[:1] == ["select"] and head != ["select", "from"]:
+        # select <list> from <table> ...: reshape to the plain select form
+        idx = find_keyword(text, "from")
+        if idx != -1:
+            projection = text[len("select") : idx].strip()
+            words = ["select", "from", *text[idx + len("from") :].strip().split(" ", 1)]
+            head = ["select", "from"]
+
+    if head == ["insert", "into"] and len(words) >= 4:
+        kind, table = "insert", words[2]
+    elif head == ["select", "from"] and len(words) >= 3:
+        kind, table = "select", words[2]
+    elif head[:1] == ["update"] and len(words) >= 2:
+        kind, table = "update", words[1]
+    elif head == ["delete", "from"] and len(words) >= 3:
+        kind, table = "delete", words[2]
+    else:
+        return None
+
+    if table not in metadata:
+        raise ValueError(f'Ошибка: Таблица "{table}" не существует.')
+    compiler = _Compiler(Plan(kind, table, metadata[table]))
+    plan = compiler.plan
+
+    if kind == "insert":
+        idx = find_keyword(text, "values")
+        if idx == -1:
+            raise _bad(text)
+        rows = parse_values_list(text[idx + len("values") :].strip())
+        plan.rows_raw = [[compiler.value(raw, None) for raw in row] for row in rows]
+
+    elif kind == "select":
+        rest = words[3] if len(words) > 3 else ""
+        where_text, order_by, limit, offset = split_select_tail(rest)
+        group_by = None
+        idx = find_keyword(where_text, "group by")
+        if idx != -1:
+            tail = where_text[idx + len("group by") :].split()
+            if len(tail) != 1 or not projection:
+                raise _bad(where_text)
+            group_by = compiler.column(tail[0])
+            where_text = where_text[:idx].strip()
+        if where_text.lower().startswith("join "):
+            if projection:
+                raise _bad(projection)
+            idx = find_keyword(where_text, "where")
+            idx = len(where_text) if idx == -1 else idx
+            compiler.join(where_text[:idx], metadata)
+            where_text = where_text[idx:]
+        if where_text:
+            if where_text.split()[0].lower() != "where":
+                raise ValueError(f"Функции {words[0]} нет. Попробуйте снова.")
+            plan.where = compiler.where(where_text[len("where") :])
+        if projection:
+            compiler.aggregate(projection, group_by)
+            plan.group_by = group_by
+            if order_by is not None and order_by[0] not in plan.projection:
+                raise ValueError(
+                    f"Ошибка: Таблица или столбец {order_by[0]} не найден."
+                )
+        elif order_by is not None:
+            order_by = (compiler.column(order_by[0]), order_by[1])
+        plan.order_by, plan.limit, plan.offset = order_by, limit, offset
+
+    elif kind == "update":
+        idx_set = find_keyword(text, "set")
+        idx_where = find_keyword(text, "where")
+        if idx_set == -1 or idx_where == -1 or idx_where < idx_set:
+            raise _bad(text)
+        set_text = text[idx_set + len("set") : idx_where].strip()
+        (scol, sraw), = parse_clause(set_text).items()
+        scol = compiler.column(scol)
+        if scol == "ID":
+            raise ValueError(
+                "Некорректное значение: нельзя менять ID. Попробуйте снова."
+            )
+        plan.set_clause = {scol: compiler.value(sraw, scol)}
+        plan.where = compiler.where(text[idx_where + len("where") :])
+
+    else:
+        idx_where = find_keyword(text, "where")
+        if idx_where == -1:
+            raise _bad(text)
+        plan.where = compiler.where(text[idx_where + len("where") :])
+
+    return compiler.finish()
@@ -0,0 +1,139 @@
+import gc
+import sys
+from collections import deque
+from collections.abc import Iterable, Mapping, MutableMapping
+from contextlib import contextmanager
+from operator import attrgetter
+
+# strings up to this length are interned: short values (names, statuses,
+# categories) are the ones that repeat; interning long ones only costs
+INTERN_MAX_LEN = 64
+
+_types: dict[tuple[str, ...], type] = {}
+
+
+def intern_value(value):
+    """The shared copy of a short string; any other value as is."""
+    if type(value) is str and len(value) <= INTERN_MAX_LEN:
+        return sys.intern(value)
+    return value
+
+
+class Row(MutableMapping):
+    """
+    Fixed-schema table row. Values live in __slots__ of a class generated
+    per column list (see row_type), so a row has no dict of its own and
+    column names are stored once per table. Reads and writes like the dict
+    rows it replaces; columns cannot be added or removed.
+    """
+
+    __slots__ = ()
+    _fields: tuple[str, ...] = ()
+    _names: dict[str, str] = {}  # column -> slot name
+
+    def __init__(self, values: Mapping | None = None) -> None:
+        get = (values or {}).get
+        for name, slot in self._names.items():
+            value = get(name)
+            if type(value) is str and len(value) <= INTERN_MAX_LEN:
+                value = sys.intern(value)
+            setattr(self, slot, value)
+
+    def __getitem__(self, key: str):
+        return getattr(self, self._names[key])
+
+    def get(self, key: str, default=None):
+        try:
+            return getattr(self, self._names[key])
+        except KeyError:
+            return default
+
+    def __setitem__(self, key: str, value) -> None:
+        setattr(self, self._names[key], intern_value(value))
+
+    def __delitem__(self, key: str) -> None:
+        raise TypeError("row columns are fixed by the table schema")
+
+    def __iter__(self):
+        return iter(self._fields)
+
+    def __len__(self) -> int:
+        return len(self._fields)
+
+    def __contains__(self, key) -> bool:
+        return key in self._names
+
+    def __reduce__(self):
+        return _rebuild, (self._fields, plain_row(self))
+
+    def __repr__(self) -> str:
+        return repr(plain_row(self))
+
+
+def row_type(fields: Iterable[str]) -> type:
+    """Row class for a column list, created once and shared by all tables."""
+    fields = tuple(fields)
+    cls = _types.get(fields)
+    if cls is None:
+        # column names need not be identifiers: slots are named by position
+        names = tuple(f"c{i}" for i in range(len(fields)))
+        cls = type("Row", (Row,), {"__slots__": names, "_fields": fields})
+        cls._names = dict(zip(fields, names))
+        _types[fields] = cls
+    return cls
+
+
+def compact_rows(schema: list[dict], rows: list[Mapping]) -> list[Row]:
+    """
+    Rows of a table converted to its compact row class. Filled column by
+    column through the slot descriptors, which keeps the per-value work in C.
+    """
+    cls = row_type(c["name"] for c in schema)
+    with _gc_paused():
+        out = [cls.__new__(cls) for _ in rows]
+    for col in schema:
+        name = col["name"]
+        values = [row.get(name) for row in rows]
+        if col["type"] == "str":
+            values = [
+                sys.intern(v) if type(v) is str and len(v) <= INTERN_MAX_LEN else v
+                for v in values
+            ]
+        deque(map(getattr(cls, cls._names[name]).__set__, out, values), maxlen=0)
+    return out
+
+
+def column_values(rows: list[Mapping], name: str) -> list:
+    """
+    One column of a row list. Rows that all share one compact class are
+    read through a C-level attrgetter instead of a get() call per row.
+    """
+    if rows and len(set(map(type, rows))) == 1:
+        slot = getattr(type(rows[0]), "_names", {}).get(name)
+        if slot is not None:
+            return list(map(attrgetter(slot), rows))
+    return [row.get(name) for row in rows]
+
+
+def plain_row(row: Mapping) -> dict:
+    """Row as a plain dict (also the json `default` for compact rows)."""
+    return {name: row[name] for name in row}
+
+
+@contextmanager
+def _gc_paused():
+    """
+    No cyclic GC passes for the block: allocating a million rows would
+    otherwise trigger collections that rescan every one of them.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _rebuild(fields: tuple[str, ...], values: dict) -> Row:
+    return row_type(fields)(values)
@@ -0,0 +1,198 @@
+import asyncio
+import io
+import json
+import sys
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AsyncExitStack, asynccontextmanager
+
+from src.primitive_db import engine
+from src.primitive_db.decorators import CONFIRM
+from src.primitive_db.utils import recover_storage
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 5433
+READ_WORKERS = 8
+_CATALOG = ""  # lock key of the whole catalog
+
+
+class _ThreadStdout(io.TextIOBase):
+    """sys.stdout replacement: each worker thread prints into its own buffer."""
+
+    def __init__(self, target) -> None:
+        self.target = target
+        self.local = threading.local()
+
+    def write(self, text: str) -> int:
+        buffer = getattr(self.local, "buffer", None)
+        return (buffer or self.target).write(text)
+
+    def flush(self) -> None:
+        if getattr(self.local, "buffer", None) is None:
+            self.target.flush()
+
+
+class _RWLock:
+    """asyncio reader/writer lock; waiting writers block new readers."""
+
+    def __init__(self) -> None:
+        self._cond = asyncio.Condition()
+        self._readers = 0
+        self._writer = False
+        self._waiting = 0
+
+    @asynccontextmanager
+    async def shared(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: not self._writer and not self._waiting)
+            self._readers += 1
+        try:
+            yield
+        finally:
+            async with self._cond:
+                self._readers -= 1
+                self._cond.notify_all()
+
+    @asynccontextmanager
+    async def exclusive(self):
+        async with self._cond:
+            self._waiting += 1
+            await self._cond.wait_for(lambda: not self._writer and not self._readers)
+            self._waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            async with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+def _execute(line: str, settings: dict) -> tuple[str, bool]:
+    """
+    Run a command in a worker thread with its client's output settings and
+    return (its output, keep going).
+    """
+    local = sys.stdout.local
+    local.buffer = io.StringIO()
+    try:
+        with engine.session_output(settings):
+            running = engine.execute_line(line)
+        return local.buffer.getvalue(), running
+    finally:
+        local.buffer = None
+
+
+class DbServer:
+    """
+    One warm engine shared by many clients. Reads of different (or the same)
+    tables run concurrently on a thread pool; writes are queued per table
+    and applied one at a time by that table's writer task, on a single
+    writer thread. Catalog commands wait for everything else to finish.
+    """
+
+    def __init__(self, read_workers: int = READ_WORKERS) -> None:
+        self._readers = ThreadPoolExecutor(read_workers)
+        self._writer = ThreadPoolExecutor(1)
+        self._locks: dict[str, _RWLock] = defaultdict(_RWLock)
+        self._queues: dict[str, asyncio.Queue] = {}
+        self._tasks: list[asyncio.Task] = []
+
+    async def _run(self, executor, line: str, settings: dict) -> tuple[str, bool]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, _execute, line, settings)
+
+    async def _drain(self, table: str, queue: asyncio.Queue) -> None:
+        while True:
+            line, settings, done = await queue.get()
+            try:
+                async with self._locks[_CATALOG].shared():
+                    async with self._locks[table].exclusive():
+                        result = await self._run(self._writer, line, settings)
+            except Exception as e:
+                done.set_exception(e)
+            else:
+                done.set_result(result)
+
+    async def submit(self, line: str, settings: dict) -> tuple[str, bool]:
+        """Run a client's command; settings are its format and pager mode."""
+        if line.split()[:1] in (["begin"], ["rollback"]):
+            # one catalog serves every client: a transaction would span them all
+            return "Ошибка: Транзакции недоступны в режиме сервера.\n", True
+        mode, table = engine.classify_command(line)
+        if mode == "write":
+            if table not in self._queues:
+                self._queues[table] = asyncio.Queue()
+                task = asyncio.create_task(self._drain(table, self._queues[table]))
+                self._tasks.append(task)
+            done = asyncio.get_running_loop().create_future()
+            self._queues[table].put_nowait((line, settings, done))
+            return await done
+        if mode == "read":
+            async with self._locks[_CATALOG].shared(), AsyncExitStack() as stack:
+                for name in engine.command_tables(line):
+                    await stack.enter_async_context(self._locks[name].shared())
+                return await self._run(self._readers, line, settings)
+        async with self._locks[_CATALOG].exclusive():
+            return await self._run(self._writer, line, settings)
+
+    async def handle(self, reader: asyncio.StreamReader,
+                     writer: asyncio.StreamWriter,
+    ) -> None:
+        """
+        Line protocol: one command per line, one JSON object per reply.
+        Output format and pager mode are settings of the connection.
+        """
+        settings = {"format": "table", "pager": False}
+        try:
+            while line := await reader.readline():
+                text = line.decode("utf-8").strip()
+                if text == "exit":
+                    break
+                if text.split()[:1] == ["pager"]:
+                    # the server can not wait for a client keypress
+                    text = "pager off"
+                try:
+                    output, _ = await self.submit(text, settings)
+                except Exception as e:
+                    output = f"Ошибка: {e}\n"
+                reply = {"output": output}
+                writer.write(json.dumps(reply, ensure_ascii=False).encode() + b"\n")
+                await writer.drain()
+        finally:
+            writer.close()
+
+    def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        self._readers.shutdown()
+        self._writer.shutdown()
+
+
+async def _serve(host: str, port: int) -> None:
+    db = DbServer()
+    server = await asyncio.start_server(db.handle, host, port)
+    print(f"Сервер запущен на {host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        db.close()
+
+
+def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> None:
+    """Run the TCP server until interrupted, then flush tables to disk."""
+    engine.configure()
+    recover_storage()
+    # clients can not answer prompts
+    CONFIRM["assume_yes"] = True
+    real_stdout = sys.stdout
+    sys.stdout = _ThreadStdout(real_stdout)
+    try:
+        asyncio.run(_serve(host, port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sys.stdout = real_stdout
+        engine.shutdown()
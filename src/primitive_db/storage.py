@@ -0,0 +1,840 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections.abc import Iterator
+
+from src.primitive_db.binfmt import BinaryTable, encode_table
+from src.primitive_db.locks import file_lock
+from src.primitive_db.rows import plain_row
+
+COMPACT_MIN_RECORDS = 1000
+COMPACT_RATIO = 1.0
+# group commit: fsync the log after this many records or milliseconds
+SYNC_EVERY_RECORDS = 64
+SYNC_INTERVAL_MS = 20
+SEGMENT_ROWS = 4096  # IDs per segment file of the segment backend
+# compaction also rewrites segments with this share of tombstones (None: only
+# vacuum does)
+VACUUM_RATIO = 0.25
+
+
+def write_atomic(path: str, payload: bytes) -> None:
+    """
+    Write payload to path via fsynced temp file + os.replace. The temp name
+    is unique, so concurrent writers of one path never share a temp file.
+    """
+    fd, tmp = temp_file(path)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    _fsync_dir(os.path.dirname(path) or ".")
+
+
+def temp_file(path: str) -> tuple[int, str]:
+    """
+    New unique <path>.<random>.tmp next to path (recover() removes leftovers
+    of these), opened for writing: (fd, name).
+    """
+    directory, name = os.path.split(path)
+    fd, tmp = tempfile.mkstemp(
+        prefix=f"{name}.", suffix=".tmp", dir=directory or "."
+    )
+    os.fchmod(fd, 0o644)
+    return fd, tmp
+
+
+def _fsync_dir(path: str) -> None:
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class JsonStorage:
+    """Whole-table storage: data/<table>.json is rewritten on every save."""
+
+    def __init__(self, data_dir: str) -> None:
+        self.data_dir = data_dir
+
+    def _table_path(self, table_name: str) -> str:
+        return os.path.join(self.data_dir, f"{table_name}.json")
+
+    def _read_snapshot_json(self, table_name: str) -> list[dict]:
+        try:
+            with open(JsonStorage._table_path(self, table_name), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+
+    def _read_snapshot(self, table_name: str) -> list[dict]:
+        return self._read_snapshot_json(table_name)
+
+    def _encode(self, data: list[dict]) -> bytes:
+        return json.dumps(
+            data, ensure_ascii=False, indent=2, default=plain_row
+        ).encode("utf-8")
+
+    def _write_snapshot(self, table_name: str, data: list[dict]) -> None:
+        write_atomic(self._table_path(table_name), self._encode(data))
+
+    def lock_path(self, table_name: str) -> str:
+        """File that processes flock to share or own the table."""
+        return os.path.join(self.data_dir, f"{table_name}.lock")
+
+    def stamp(self, table_name: str) -> list[int]:
+        """Cheap fingerprint of on-disk table state (changes on every write)."""
+        return _file_stamp(self._table_path(table_name))
+
+    def load(self, table_name: str) -> list[dict]:
+        os.makedirs(self.data_dir, exist_ok=True)
+        return _in_id_order(self._read_snapshot(table_name))
+
+    def save(self, table_name: str, data: list[dict]) -> None:
+        os.makedirs(self.data_dir, exist_ok=True)
+        self._write_snapshot(table_name, data)
+
+    def sync(self) -> None:
+        """Make all acknowledged writes durable (no-op: saves are synchronous)."""
+
+    def recover(self) -> None:
+        """Clean up after a crash: drop temp files left by interrupted saves."""
+        try:
+            names = os.listdir(self.data_dir)
+        except FileNotFoundError:
+            return
+        for name in names:
+            if name.endswith(".tmp"):
+                # another process may be mid-save: wait for its table lock
+                with self._table_lock(name):
+                    try:
+                        os.remove(os.path.join(self.data_dir, name))
+                    except FileNotFoundError:
+                        pass
+
+    def vacuum(self, table_name: str) -> int:
+        """Rows reclaimed from deleted space: none, every save rewrites the file."""
+        return 0
+
+    def iter_rows(self, table_name: str) -> Iterator[dict]:
+        """Rows in ID order for a one-pass read (the whole file is parsed)."""
+        yield from self.load(table_name)
+
+    def top_id(self, table_name: str) -> int:
+        """
+        Highest row ID in the table's files (0 if none). Deleted rows may
+        still count. Here the whole file is parsed: it has no header.
+        """
+        data = self.load(table_name)
+        return data[-1]["ID"] if data else 0
+
+    def fold(self, table_name: str) -> None:
+        """
+        Fold pending log records into the snapshot now, if that costs only
+        the rows they touch. Whole-file backends leave it to compaction.
+        """
+
+    def _table_lock(self, file_name: str):
+        """Exclusive lock of the table a data file belongs to."""
+        table_name = file_name.split(".", 1)[0]
+        return file_lock(self.lock_path(table_name), exclusive=True)
+
+    def append_insert(self, table_name: str, row: dict) -> None:
+        data = self.load(table_name)
+        data.append(row)
+        self.save(table_name, data)
+
+    def append_insert_many(self, table_name: str, rows: list[dict]) -> None:
+        data = self.load(table_name)
+        data.extend(rows)
+        self.save(table_name, data)
+
+    def append_update(self, table_name: str, ids: list[int], changes: dict) -> None:
+        wanted = set(ids)
+        data = self.load(table_name)
+        for row in data:
+            if row.get("ID") in wanted:
+                row.update(changes)
+        self.save(table_name, data)
+
+    def append_delete(self, table_name: str, ids: list[int]) -> None:
+        wanted = set(ids)
+        data = [r for r in self.load(table_name) if r.get("ID") not in wanted]
+        self.save(table_name, data)
+
+    def append_batch(self, table_name: str, changes: list[tuple[str, tuple]]) -> None:
+        """Apply changes [(op, args of append_<op>)] all at once, in one save."""
+        rows = {r["ID"]: r for r in self.load(table_name)}
+        for op, args in changes:
+            for rec in _change_records(op, args)[0]:
+                _apply(rows, rec)
+        self.save(table_name, _in_id_order(list(rows.values())))
+
+
+class LogStorage(JsonStorage):
+    """
+    Snapshot data/<table>.json plus write-ahead log data/<table>.log.
+    Every write appends JSON lines to the log and is flushed to the OS at
+    once; fsync is batched (group commit) per SYNC_EVERY_RECORDS /
+    SYNC_INTERVAL_MS. Load replays the log over the snapshot; checkpoints
+    write the snapshot atomically and then truncate the log. Replay is
+    idempotent, so a crash between those two steps is harmless.
+    """
+
+    # compact once the log has this many records per live row
+    compact_ratio = COMPACT_RATIO
+
+    def __init__(self, data_dir: str) -> None:
+        super().__init__(data_dir)
+        self._lock = threading.Lock()
+        self._files: dict = {}
+        self._unsynced: dict[str, int] = {}
+        self._sync_timer: threading.Timer | None = None
+        self._log_records: dict[str, int] = {}
+        self._live_rows: dict[str, int] = {}
+        self._compacting: set[str] = set()
+
+    def _log_path(self, table_name: str) -> str:
+        return os.path.join(self.data_dir, f"{table_name}.log")
+
+    def _read_log(self, table_name: str) -> list[dict]:
+        """Records of the log in order; a torn tail is cut off the file."""
+        records: list[dict] = []
+        valid = 0
+        path = self._log_path(table_name)
+        try:
+            with open(path, "rb") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        break
+                    if not line.endswith(b"\n"):
+                        break
+                    if rec.get("op") == "batch":
+                        # one line, so a batch is replayed whole or not at all
+                        records.extend(rec["recs"])
+                    else:
+                        records.append(rec)
+                    valid += len(line)
+                size = f.seek(0, 2)
+        except FileNotFoundError:
+            size = 0
+
+        if size > valid:
+            # torn tail after a crash mid-append: cut it off so that new
+            # records are not appended behind garbage
+            self._close_log(table_name)
+            os.truncate(path, valid)
+        return records
+
+    def _replay(self, table_name: str) -> list[dict]:
+        rows = {r["ID"]: r for r in self._read_snapshot(table_name)}
+        records = self._read_log(table_name)
+        for rec in records:
+            _apply(rows, rec)
+        self._log_records[table_name] = len(records)
+        self._live_rows[table_name] = len(rows)
+        return _in_id_order(list(rows.values()))
+
+    def _checkpoint(self, table_name: str, data: list[dict]) -> None:
+        write_atomic(self._table_path(table_name), self._encode(data))
+        self._truncate_log(table_name)
+        self._live_rows[table_name] = len(data)
+
+    def _truncate_log(self, table_name: str) -> None:
+        self._close_log(table_name)
+        with open(self._log_path(table_name), "wb") as f:
+            os.fsync(f.fileno())
+        self._log_records[table_name] = 0
+
+    def _close_log(self, table_name: str) -> None:
+        f = self._files.pop(table_name, None)
+        if f is not None:
+            if self._unsynced.pop(table_name, 0):
+                os.fsync(f.fileno())
+            f.close()
+
+    def stamp(self, table_name: str) -> list[int]:
+        return super().stamp(table_name) + _file_stamp(self._log_path(table_name))
+
+    def load(self, table_name: str) -> list[dict]:
+        os.makedirs(self.data_dir, exist_ok=True)
+        with self._lock:
+            return self._replay(table_name)
+
+    def save(self, table_name: str, data: list[dict]) -> None:
+        os.makedirs(self.data_dir, exist_ok=True)
+        with self._lock:
+            self._checkpoint(table_name, data)
+
+    def recover(self) -> None:
+        """
+        Drop temp files and cut torn log tails left by a crash. Logs are
+        replayed over their snapshots when a table is first loaded.
+        """
+        super().recover()
+        try:
+            names = os.listdir(self.data_dir)
+        except FileNotFoundError:
+            return
+        for name in names:
+            if name.endswith(".log"):
+                with self._table_lock(name), self._lock:
+                    self._close_log(name[: -len(".log")])
+                    _repair_tail(os.path.join(self.data_dir, name))
+
+    def _append(self, table_name: str, recs: list[dict], delta: int) -> None:
+        os.makedirs(self.data_dir, exist_ok=True)
+        payload = "".join(
+            json.dumps(rec, ensure_ascii=False, default=plain_row) + "\n"
+            for rec in recs
+        )
+        with self._lock:
+            f = self._files.get(table_name)
+            if f is None:
+                f = open(self._log_path(table_name), "ab")
+                self._files[table_name] = f
+            f.write(payload.encode("utf-8"))
+            f.flush()
+
+            pending = self._unsynced.get(table_name, 0) + len(recs)
+            if pending >= SYNC_EVERY_RECORDS:
+                os.fsync(f.fileno())
+                pending = 0
+            self._unsynced[table_name] = pending
+            if pending and self._sync_timer is None:
+                self._sync_timer = threading.Timer(
+                    SYNC_INTERVAL_MS / 1000, self.sync
+                )
+                self._sync_timer.daemon = True
+                self._sync_timer.start()
+
+            records = self._log_records.get(table_name, 0) + len(recs)
+            self._log_records[table_name] = records
+            self._live_rows[table_name] = self._live_rows.get(table_name, 0) + delta
+        self._maybe_compact(table_name)
+
+    def sync(self) -> None:
+        """fsync every log with records not yet on stable storage."""
+        with self._lock:
+            self._sync_timer = None
+            for table_name, pending in self._unsynced.items():
+                if pending:
+                    os.fsync(self._files[table_name].fileno())
+            self._unsynced.clear()
+
+    def append_insert(self, table_name: str, row: dict) -> None:
+        self._append(table_name, *_change_records("insert", (row,)))
+
+    def append_insert_many(self, table_name: str, rows: list[dict]) -> None:
+        self._append(table_name, *_change_records("insert_many", (rows,)))
+
+    def append_update(self, table_name: str, ids: list[int], changes: dict) -> None:
+        self._append(table_name, *_change_records("update", (ids, changes)))
+
+    def append_delete(self, table_name: str, ids: list[int]) -> None:
+        self._append(table_name, *_change_records("delete", (ids,)))
+
+    def append_batch(self, table_name: str, changes: list[tuple[str, tuple]]) -> None:
+        """
+        Log changes [(op, args of append_<op>)] as a single record: a crash
+        mid-append loses the whole batch, never a part of it.
+        """
+        recs: list[dict] = []
+        delta = 0
+        for op, args in changes:
+            change, count = _change_records(op, args)
+            recs.extend(change)
+            delta += count
+        self._append(table_name, [{"op": "batch", "recs": recs}], delta)
+
+    def _maybe_compact(self, table_name: str) -> None:
+        records = self._log_records.get(table_name, 0)
+        live = max(self._live_rows.get(table_name, 0), 0)
+        if records < COMPACT_MIN_RECORDS or records < live * self.compact_ratio:
+            return
+        if table_name in self._compacting:
+            return
+        self._compacting.add(table_name)
+        threading.Thread(
+            target=self.compact, args=(table_name,), daemon=True
+        ).start()
+
+    def compact(self, table_name: str) -> None:
+        """Fold the log into a fresh snapshot and truncate it."""
+        try:
+            # other processes append to the same log: take their table lock
+            with self._table_lock(table_name), self._lock:
+                self._checkpoint(table_name, self._replay(table_name))
+        finally:
+            self._compacting.discard(table_name)
+
+    def vacuum(self, table_name: str) -> int:
+        """Compact now; returns the number of deleted rows dropped from the log."""
+        with self._table_lock(table_name), self._lock:
+            records = self._read_log(table_name)
+            self._checkpoint(table_name, self._replay(table_name))
+        return sum(len(rec["ids"]) for rec in records if rec.get("op") == "delete")
+
+
+class BinaryStorage(LogStorage):
+    """
+    LogStorage whose snapshot is data/<table>.bin (see binfmt) instead of
+    JSON. While the log is empty, equality selects run directly on the
+    memory-mapped snapshot and materialize only matching rows.
+    A legacy data/<table>.json is read until the first checkpoint writes .bin.
+    """
+
+    def _table_path(self, table_name: str) -> str:
+        return os.path.join(self.data_dir, f"{table_name}.bin")
+
+    def _read_snapshot(self, table_name: str) -> list[dict]:
+        try:
+            with BinaryTable(self._table_path(table_name)) as table:
+                return table.read_rows()
+        except FileNotFoundError:
+            return self._read_snapshot_json(table_name)
+
+    def _encode(self, data: list[dict]) -> bytes:
+        return encode_table(data)
+
+    def top_id(self, table_name: str) -> int:
+        """Highest row ID: the snapshot header's top_id or an ID the log inserts."""
+        with self._lock:
+            records = self._read_log(table_name)
+        try:
+            with BinaryTable(self._table_path(table_name)) as table:
+                top = table.top_id
+        except FileNotFoundError:
+            top = None
+        if top is None:
+            # legacy snapshot without the header field
+            return super().top_id(table_name)
+        return max(top, _log_top_id(records))
+
+    def select_eq(self, table_name: str, col: str, val) -> list[dict] | None:
+        """Rows with col == val read via mmap, or None if a full load is needed."""
+        if _file_stamp(self._log_path(table_name))[1] > 0:
+            return None
+        try:
+            with BinaryTable(self._table_path(table_name)) as table:
+                if col not in table.columns:
+                    return None
+                return table.read_rows(table.find_eq(col, val))
+        except FileNotFoundError:
+            return None
+
+
+class SegmentStorage(LogStorage):
+    """
+    LogStorage whose snapshot is split into fixed ID ranges: segment k in
+    data/<table>.seg/ holds the rows with (ID - 1) // segment_rows == k.
+    Deleted rows stay in their segment, listed in its tombstone file
+    k.del.json, until vacuum. Compaction folds the log only into the
+    segments it touches: inserts and updates rewrite their segment, deletes
+    just add tombstones (a segment with VACUUM_RATIO of its rows dead is
+    rewritten instead), so its cost tracks the rows written, not the table
+    size. The stamp is a log sequence number that compaction and vacuum
+    leave unchanged, so resident copies of the table are not reloaded.
+    A legacy data/<table>.json is read until the first checkpoint.
+    """
+
+    # folding costs only the dirty segments: no need to wait for a long log
+    compact_ratio = 0.0
+
+    def __init__(self, data_dir: str) -> None:
+        super().__init__(data_dir)
+        self._manifests: dict[str, tuple[list[int], dict | None]] = {}
+        # per table: (lsn, {segment: digest of its file}) for segments
+        # without tombstones, to skip rewriting unchanged ones on save
+        self._digests: dict[str, tuple[int, dict[int, bytes]]] = {}
+
+    def _segment_dir(self, table_name: str) -> str:
+        return os.path.join(self.data_dir, f"{table_name}.seg")
+
+    def _table_path(self, table_name: str) -> str:
+        return os.path.join(self._segment_dir(table_name), "manifest.json")
+
+    def _segment_path(self, table_name: str, k: int) -> str:
+        return os.path.join(self._segment_dir(table_name), f"{k}.json")
+
+    def _tombstone_path(self, table_name: str, k: int) -> str:
+        return os.path.join(self._segment_dir(table_name), f"{k}.del.json")
+
+    def _manifest(self, table_name: str) -> dict | None:
+        """Segment manifest, re-read only when its file changes."""
+        path = self._table_path(table_name)
+        stamp = _file_stamp(path)
+        cached = self._manifests.get(table_name)
+        if cached is None or cached[0] != stamp:
+            try:
+                with open(path, encoding="utf-8") as f:
+                    manifest = json.load(f)
+            except FileNotFoundError:
+                manifest = None
+            if manifest is not None:
+                segments = manifest["segments"].items()
+                manifest["segments"] = {int(k): v for k, v in segments}
+            cached = self._manifests[table_name] = (stamp, manifest)
+        return cached[1]
+
+    def _write_manifest(self, table_name: str, manifest: dict) -> None:
+        segments = sorted(manifest["segments"].items())
+        payload = dict(manifest, segments={str(k): v for k, v in segments})
+        write_atomic(self._table_path(table_name), json.dumps(payload).encode("utf-8"))
+
+    def _lsn(self, table_name: str, manifest: dict) -> int:
+        return manifest["lsn"] + _file_stamp(self._log_path(table_name))[1]
+
+    def stamp(self, table_name: str) -> list[int]:
+        """Log sequence number: grows with every write, kept by compaction."""
+        with self._lock:
+            manifest = self._manifest(table_name)
+            if manifest is None:
+                legacy = JsonStorage._table_path(self, table_name)
+                return _file_stamp(legacy) + _file_stamp(self._log_path(table_name))
+            return [self._lsn(table_name, manifest)]
+
+    def _tombstones(self, table_name: str, k: int) -> set[int]:
+        try:
+            with open(self._tombstone_path(table_name, k), encoding="utf-8") as f:
+                return set(json.load(f))
+        except FileNotFoundError:
+            return set()
+
+    def _segment_rows(self, table_name: str, k: int) -> tuple[list[dict], bytes | None]:
+        """(live rows of segment k, digest of its file if it has no tombstones)."""
+        try:
+            with open(self._segment_path(table_name, k), "rb") as f:
+                payload = f.read()
+        except FileNotFoundError:
+            return [], None
+        rows = json.loads(payload)
+        dead = self._tombstones(table_name, k)
+        if dead:
+            return [row for row in rows if row["ID"] not in dead], None
+        return rows, _digest(payload)
+
+    def _read_snapshot(self, table_name: str) -> list[dict]:
+        manifest = self._manifest(table_name)
+        if manifest is None:
+            return self._read_snapshot_json(table_name)
+        rows: list[dict] = []
+        digests: dict[int, bytes] = {}
+        for k in sorted(manifest["segments"]):
+            segment, digest = self._segment_rows(table_name, k)
+            rows.extend(segment)
+            if digest is not None:
+                digests[k] = digest
+        self._digests[table_name] = (manifest["lsn"], digests)
+        return rows
+
+    def _write_segment(self,
+                       table_name: str,
+                       k: int,
+                       rows: list[dict],
+                       manifest: dict,
+    ) -> None:
+        """Rewrite segment k with exactly rows and no tombstones."""
+        known = self._digests.get(table_name)
+        if known is not None and known[0] != manifest["lsn"]:
+            known = None
+        path = self._segment_path(table_name, k)
+        if rows:
+            payload = _encode_segment(rows)
+            write_atomic(path, payload)
+            manifest["segments"][k] = [len(rows), 0]
+            if known is not None:
+                known[1][k] = _digest(payload)
+        else:
+            _remove(path)
+            manifest["segments"].pop(k, None)
+            if known is not None:
+                known[1].pop(k, None)
+        _remove(self._tombstone_path(table_name, k))
+
+    def _checkpoint(self, table_name: str, data: list[dict]) -> None:
+        """Save the whole table, writing only segments whose rows changed."""
+        os.makedirs(self._segment_dir(table_name), exist_ok=True)
+        old = self._manifest(table_name)
+        size = old["segment_rows"] if old else SEGMENT_ROWS
+        digests: dict[int, bytes] = {}
+        known = self._digests.get(table_name)
+        if old is not None and known is not None and known[0] == old["lsn"]:
+            digests = known[1]
+        # a full save is a change of its own: move the lsn past the log
+        lsn = self._lsn(table_name, old) + 1 if old else 1
+        top = max(old.get("top", 0) if old else 0, data[-1]["ID"] if data else 0)
+        manifest = {"segment_rows": size, "lsn": lsn, "top": top, "segments": {}}
+        self._digests[table_name] = (lsn, {})
+
+        groups: dict[int, list[dict]] = {}
+        for row in data:
+            groups.setdefault((row["ID"] - 1) // size, []).append(row)
+        for k, rows in groups.items():
+            payload = _encode_segment(rows)
+            digest = _digest(payload)
+            if digests.get(k) == digest:
+                # same rows as the file and no tombstones: keep it
+                manifest["segments"][k] = [len(rows), 0]
+                self._digests[table_name][1][k] = digest
+            else:
+                self._write_segment(table_name, k, rows, manifest)
+        for k in set(old["segments"] if old else ()) - set(groups):
+            _remove(self._segment_path(table_name, k))
+            _remove(self._tombstone_path(table_name, k))
+
+        self._write_manifest(table_name, manifest)
+        self._truncate_log(table_name)
+        self._live_rows[table_name] = len(data)
+
+    def _fold(self, table_name: str) -> None:
+        """Apply the log to the segments it touches, then truncate it."""
+        manifest = self._manifest(table_name)
+        if manifest is None:
+            # legacy or new table: the first checkpoint writes every segment
+            self._checkpoint(table_name, self._replay(table_name))
+            return
+        records = self._read_log(table_name)
+        size = manifest["segment_rows"]
+        top = manifest.get("top")
+        manifest = {
+            "segment_rows": size,
+            "lsn": self._lsn(table_name, manifest),
+            "segments": dict(manifest["segments"]),
+        }
+        if top is not None:
+            manifest["top"] = max(top, _log_top_id(records))
+
+        per_segment = _records_by_segment(records, size)
+        for k, recs in per_segment.items():
+            in_file = manifest["segments"].get(k, [0, 0])[0]
+            if all(rec.get("op") == "delete" for rec in recs):
+                dead = self._tombstones(table_name, k)
+                dead.update(
+                    row_id
+                    for rec in recs
+                    for row_id in rec["ids"]
+                    if (row_id - 1) // size == k
+                )
+                if VACUUM_RATIO is None or len(dead) < VACUUM_RATIO * in_file:
+                    path = self._tombstone_path(table_name, k)
+                    write_atomic(path, json.dumps(sorted(dead)).encode("utf-8"))
+                    manifest["segments"][k] = [in_file, len(dead)]
+                    if table_name in self._digests:
+                        self._digests[table_name][1].pop(k, None)
+                    continue
+            rows = self._segment_rows(table_name, k)[0]
+            self._write_segment(
+                table_name, k, _apply_segment(rows, recs, k, size), manifest
+            )
+
+        self._write_manifest(table_name, manifest)
+        self._truncate_log(table_name)
+
+    def compact(self, table_name: str) -> None:
+        """Fold the log into the segments it touches and truncate it."""
+        try:
+            with self._table_lock(table_name), self._lock:
+                self._fold(table_name)
+        finally:
+            self._compacting.discard(table_name)
+
+    def fold(self, table_name: str) -> None:
+        """Fold the log now: costs only the segments it touches."""
+        with self._table_lock(table_name), self._lock:
+            self._fold(table_name)
+
+    def iter_rows(self, table_name: str) -> Iterator[dict]:
+        """
+        Rows in ID order with one segment in memory at a time: the log is
+        applied to each segment as it is read. Callers hold the table lock.
+        """
+        with self._lock:
+            manifest = self._manifest(table_name)
+            records = self._read_log(table_name) if manifest else []
+        if manifest is None:
+            yield from self.load(table_name)
+            return
+        size = manifest["segment_rows"]
+        per_segment = _records_by_segment(records, size)
+        for k in sorted(set(manifest["segments"]) | set(per_segment)):
+            rows = self._segment_rows(table_name, k)[0]
+            if k in per_segment:
+                rows = _apply_segment(rows, per_segment[k], k, size)
+            yield from rows
+
+    def top_id(self, table_name: str) -> int:
+        """Highest row ID: the manifest's top or an ID the log inserts."""
+        with self._lock:
+            manifest = self._manifest(table_name)
+            records = self._read_log(table_name) if manifest else []
+        if manifest is None or "top" not in manifest:
+            # new table or a manifest written before top was kept
+            return super().top_id(table_name)
+        return max(manifest["top"], _log_top_id(records))
+
+    def vacuum(self, table_name: str) -> int:
+        """
+        Fold the log, then rewrite every segment that has tombstones and
+        drop empty ones. Returns the number of dead rows reclaimed.
+        """
+        reclaimed = 0
+        with self._table_lock(table_name), self._lock:
+            self._fold(table_name)
+            manifest = self._manifest(table_name)
+            manifest = dict(manifest, segments=dict(manifest["segments"]))
+            for k, (in_file, dead) in list(manifest["segments"].items()):
+                if dead:
+                    rows = self._segment_rows(table_name, k)[0]
+                    reclaimed += in_file - len(rows)
+                    self._write_segment(table_name, k, rows, manifest)
+            self._write_manifest(table_name, manifest)
+        return reclaimed
+
+    def recover(self) -> None:
+        """LogStorage recovery plus temp files left inside segment directories."""
+        super().recover()
+        try:
+            names = os.listdir(self.data_dir)
+        except FileNotFoundError:
+            return
+        for name in names:
+            if not name.endswith(".seg"):
+                continue
+            path = os.path.join(self.data_dir, name)
+            with self._table_lock(name):
+                for file_name in os.listdir(path):
+                    if file_name.endswith(".tmp"):
+                        _remove(os.path.join(path, file_name))
+
+
+def _records_by_segment(records: list[dict], size: int) -> dict[int, list[dict]]:
+    """Log records grouped by the segments whose rows they touch."""
+    per_segment: dict[int, list[dict]] = {}
+    for rec in records:
+        if rec.get("op") == "insert":
+            ids = [rec["row"]["ID"]]
+        else:
+            ids = rec.get("ids", [])
+        for k in {(row_id - 1) // size for row_id in ids}:
+            per_segment.setdefault(k, []).append(rec)
+    return per_segment
+
+
+def _apply_segment(rows: list[dict], recs: list[dict], k: int, size: int) -> list[dict]:
+    """Rows of segment k after its log records, in ID order."""
+    by_id = {row["ID"]: row for row in rows}
+    for rec in recs:
+        if rec.get("op") != "insert" or (rec["row"]["ID"] - 1) // size == k:
+            _apply(by_id, rec)
+    return sorted(by_id.values(), key=lambda r: r["ID"])
+
+
+def _encode_segment(rows: list[dict]) -> bytes:
+    return json.dumps(
+        rows, ensure_ascii=False, separators=(",", ":"), default=plain_row
+    ).encode("utf-8")
+
+
+def _digest(payload: bytes) -> bytes:
+    return hashlib.blake2b(payload, digest_size=16).digest()
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _in_id_order(rows: list[dict]) -> list[dict]:
+    """
+    Rows sorted by ID: the engine relies on it for binary search by ID.
+    Data written by the engine is already in order, so this is one
+    linear pass; only hand-edited files actually get reordered.
+    """
+    rows.sort(key=lambda r: r.get("ID", 0))
+    return rows
+
+
+def _repair_tail(path: str) -> None:
+    """
+    Truncate a log after its last newline. Records never contain a raw
+    newline, so anything after the last one is a torn append.
+    """
+    with open(path, "rb+") as f:
+        end = f.seek(0, 2)
+        pos = end
+        while pos > 0:
+            start = max(0, pos - 4096)
+            f.seek(start)
+            cut = f.read(pos - start).rfind(b"\n")
+            if cut != -1:
+                pos = start + cut + 1
+                break
+            pos = start
+        if pos != end:
+            f.truncate(pos)
+
+
+def _file_stamp(path: str) -> list[int]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return [0, 0]
+    return [st.st_mtime_ns, st.st_size]
+
+
+def _change_records(op: str, args: tuple) -> tuple[list[dict], int]:
+    """Log records of one append_<op>(*args) and its change of live rows."""
+    if op == "insert":
+        return [{"op": "insert", "row": args[0]}], 1
+    if op == "insert_many":
+        return [{"op": "insert", "row": row} for row in args[0]], len(args[0])
+    if op == "update":
+        return [{"op": "update", "ids": args[0], "set": args[1]}], 0
+    return [{"op": "delete", "ids": args[0]}], -len(args[0])
+
+
+def _log_top_id(records: list[dict]) -> int:
+    return max(
+        (rec["row"]["ID"] for rec in records if rec.get("op") == "insert"),
+        default=0,
+    )
+
+
+def _apply(rows: dict, rec: dict) -> None:
+    op = rec.get("op")
+    if op == "insert":
+        row = rec["row"]
+        rows[row["ID"]] = row
+    elif op == "update":
+        for row_id in rec["ids"]:
+            if row_id in rows:
+                rows[row_id].update(rec["set"])
+    elif op == "delete":
+        for row_id in rec["ids"]:
+            rows.pop(row_id, None)
+
+
+STORAGE_BACKENDS = {
+    "json": JsonStorage,
+    "log": LogStorage,
+    "binary": BinaryStorage,
+    "segment": SegmentStorage,
+}
@@ -1,8 +1,18 @@
+import csv
 import json
 import os
+from collections.abc import Iterable, Iterator, Mapping
+
+from src.primitive_db.indexes import SortedIndex, build_index
+from src.primitive_db.locks import file_lock
+from src.primitive_db.storage import STORAGE_BACKENDS, temp_file, write_atomic
 
 META_FILE = "db_meta.json"
 DATA_DIR = "data"
+STORAGE_BACKEND = "segment"
+
+_storage = None
+_versions: dict[str, int] = {}
 
 
 def load_metadata(filepath: str) -> dict:
@@ -14,31 +24,303 @@ def load_metadata(filepath: str) -> dict:
         return {}
 
 
+def _encode_json(data) -> bytes:
+    return json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+
+
 def save_metadata(filepath: str, data: dict) -> None:
-    """Save metadata dict to JSON file."""
-    with open(filepath, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    """Atomically save metadata dict to JSON file."""
+    write_atomic(filepath, _encode_json(data))
 
 
-def _table_path(table_name: str) -> str:
-    return os.path.join(DATA_DIR, f"{table_name}.json")
+def get_storage():
+    """Return the storage backend selected by STORAGE_BACKEND."""
+    global _storage
+    if _storage is None:
+        _storage = STORAGE_BACKENDS[STORAGE_BACKEND](DATA_DIR)
+    return _storage
 
 
-def load_table_data(table_name: str) -> list[dict]:
-    """Load table data from data/<table>.json. If not found, return empty list."""
+def recover_storage() -> None:
+    """Repair on-disk state after a crash; call once at startup."""
+    with catalog_lock(exclusive=True):
+        get_storage().recover()
+
+
+def sync_storage() -> None:
+    """Force group-committed writes to stable storage."""
+    get_storage().sync()
+
+
+def set_storage_backend(name: str) -> None:
+    """Switch storage backend ("json", "log", "binary" or "segment")."""
+    global STORAGE_BACKEND, _storage
+    if name not in STORAGE_BACKENDS:
+        raise ValueError(f"Некорректное значение: {name}. Попробуйте снова.")
+    STORAGE_BACKEND = name
+    _storage = None
+
+
+def table_lock(table_name: str, exclusive: bool = False):
+    """
+    Cross-process lock of one table: shared for reads, exclusive for
+    writes (so the ID sequence and the log are never raced).
+    """
     os.makedirs(DATA_DIR, exist_ok=True)
-    path = _table_path(table_name)
-    try:
-        with open(path, encoding="utf-8") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return []
+    return file_lock(get_storage().lock_path(table_name), exclusive)
+
+
+def catalog_lock(exclusive: bool = False):
+    """Cross-process lock of db_meta.json; exclusive for DDL."""
+    return file_lock(f"{META_FILE}.lock", exclusive)
+
+
+def bump_version(table_name: str) -> None:
+    """Mark table contents as changed for version-keyed caches."""
+    _versions[table_name] = _versions.get(table_name, 0) + 1
+
+
+def table_version(table_name: str) -> tuple:
+    """
+    Version of table contents: bumped by every write in this process and
+    combined with the on-disk stamp to catch writes from other processes.
+    """
+    return (_versions.get(table_name, 0), *get_storage().stamp(table_name))
+
+
+def load_table_data(table_name: str) -> list[dict]:
+    """Load table rows from the storage backend. If not found, return empty list."""
+    return get_storage().load(table_name)
 
 
 def save_table_data(table_name: str, data: list[dict]) -> None:
-    """Save table data to data/<table>.json."""
+    """Save the whole table through the storage backend (see STORAGE_BACKENDS)."""
+    get_storage().save(table_name, data)
+    bump_version(table_name)
+
+
+def select_eq(table_name: str, col: str, val) -> list[dict] | None:
+    """
+    Rows with col == val straight from storage without loading the table,
+    or None if the backend cannot do that right now.
+    """
+    storage = get_storage()
+    if not hasattr(storage, "select_eq"):
+        return None
+    return storage.select_eq(table_name, col, val)
+
+
+def vacuum_table(table_name: str) -> int:
+    """Reclaim space held by deleted rows; returns how many were dropped."""
+    return get_storage().vacuum(table_name)
+
+
+def iter_table_rows(table_name: str) -> Iterator[dict]:
+    """Rows of a table streamed from storage in ID order, without loading it."""
+    return get_storage().iter_rows(table_name)
+
+
+def fold_log(table_name: str) -> None:
+    """Fold the table's pending log into its snapshot if that is cheap."""
+    get_storage().fold(table_name)
+
+
+def export_rows(rows: Iterable[Mapping], columns: list[str], path: str) -> int:
+    """
+    Stream rows to path as .csv (header row), .jsonl or .json (array, one
+    row per line), one row in memory at a time. The file is written under
+    a temporary name and renamed when complete. Returns row count.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in (".csv", ".jsonl", ".json"):
+        raise ValueError(f"Некорректное значение: {path}. Попробуйте снова.")
+    count = 0
+    fd, tmp = temp_file(path)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            if ext == ".csv":
+                writer = csv.writer(f)
+                writer.writerow(columns)
+                for row in rows:
+                    writer.writerow([row.get(c) for c in columns])
+                    count += 1
+            elif ext == ".jsonl":
+                for row in rows:
+                    record = {c: row.get(c) for c in columns}
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    count += 1
+            else:
+                f.write("[")
+                for row in rows:
+                    record = {c: row.get(c) for c in columns}
+                    f.write(",\n" if count else "\n")
+                    f.write(json.dumps(record, ensure_ascii=False))
+                    count += 1
+                f.write("\n]\n")
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return count
+
+
+def append_insert(table_name: str, row: dict) -> None:
+    """Persist a single inserted row."""
+    get_storage().append_insert(table_name, row)
+    bump_version(table_name)
+
+
+def append_insert_many(table_name: str, rows: list[dict]) -> None:
+    """Persist a batch of inserted rows with a single write."""
+    get_storage().append_insert_many(table_name, rows)
+    bump_version(table_name)
+
+
+def append_update(table_name: str, ids: list[int], changes: dict) -> None:
+    """Persist changes applied to rows with given IDs."""
+    get_storage().append_update(table_name, ids, changes)
+    bump_version(table_name)
+
+
+def append_delete(table_name: str, ids: list[int]) -> None:
+    """Persist deletion of rows with given IDs."""
+    get_storage().append_delete(table_name, ids)
+    bump_version(table_name)
+
+
+def append_batch(table_name: str, changes: list[tuple[str, tuple]]) -> None:
+    """Persist changes [(op, args of append_<op>)] together, all or none."""
+    get_storage().append_batch(table_name, changes)
+    bump_version(table_name)
+
+
+def _header_path(table_name: str) -> str:
+    return os.path.join(DATA_DIR, f"{table_name}.meta.json")
+
+
+def load_table_header(table_name: str) -> dict:
+    """Load per-table header (indexes etc.). If not found, return empty dict."""
+    return load_metadata(_header_path(table_name))
+
+
+def save_table_header(table_name: str, header: dict) -> None:
+    """Atomically save per-table header to data/<table>.meta.json."""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    write_atomic(_header_path(table_name), _encode_json(header))
+
+
+def table_seq(table_name: str) -> int:
+    """Header "seq": the highest ID handed out whose row was deleted."""
+    return load_table_header(table_name).get("seq", 0)
+
+
+def last_id(table_name: str) -> int:
+    """
+    Highest ID the table has handed out, without loading it: the header
+    "seq" or the top ID storage keeps (see Catalog.last_id for a resident
+    table).
+    """
+    return max(table_seq(table_name), get_storage().top_id(table_name))
+
+
+def keep_last_id(table_name: str, row_id: int) -> None:
+    """
+    Record in the header that row_id was handed out, before the row holding
+    the table's highest ID is deleted, so that IDs are never reused.
+    """
+    header = load_table_header(table_name)
+    if header.get("seq", 0) < row_id:
+        header["seq"] = row_id
+        save_table_header(table_name, header)
+
+
+INDEX_KINDS = {"hash": "indexes", "sorted": "sorted_indexes"}
+
+
+def _index_path(table_name: str, col: str, kind: str = "hash") -> str:
+    ext = "idx" if kind == "hash" else "sidx"
+    return os.path.join(DATA_DIR, f"{table_name}.{col}.{ext}.json")
+
+
+def _build(kind: str, table_data: list[dict], col: str) -> dict | SortedIndex:
+    if kind == "sorted":
+        return SortedIndex.build(table_data, col)
+    return build_index(table_data, col)
+
+
+def save_index(table_name: str, col: str, index: dict | SortedIndex) -> None:
+    """Save index together with the table stamp it was built for."""
     os.makedirs(DATA_DIR, exist_ok=True)
-    path = _table_path(table_name)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    if isinstance(index, SortedIndex):
+        kind, entries = "sorted", index.entries
+    else:
+        kind, entries = "hash", [[value, ids] for value, ids in index.items()]
+    payload = {"stamp": get_storage().stamp(table_name), "entries": entries}
+    encoded = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    write_atomic(_index_path(table_name, col, kind), encoded)
+
+
+def load_indexes(table_name: str, table_data: list[dict]) -> dict:
+    """
+    Load hash and sorted indexes listed in the table header.
+    A persisted index is reused only if the table has not been written since
+    it was saved; otherwise it is rebuilt from table_data and saved again.
+    """
+    stamp = get_storage().stamp(table_name)
+    header = load_table_header(table_name)
+    indexes: dict = {}
+    for kind, key in INDEX_KINDS.items():
+        for col in header.get(key, []):
+            payload = load_metadata(_index_path(table_name, col, kind))
+            if payload.get("stamp") != stamp:
+                indexes[col] = _build(kind, table_data, col)
+                save_index(table_name, col, indexes[col])
+            elif kind == "sorted":
+                indexes[col] = SortedIndex([tuple(e) for e in payload["entries"]])
+            else:
+                indexes[col] = {value: ids for value, ids in payload["entries"]}
+    return indexes
+
+
+def create_index(table_name: str,
+                 col: str,
+                 table_data: list[dict],
+                 kind: str = "hash",
+) -> dict | SortedIndex:
+    """Register and build a hash or sorted index on column (one per column)."""
+    if kind not in INDEX_KINDS:
+        raise ValueError(f"Некорректное значение: {kind}. Попробуйте снова.")
+    header = load_table_header(table_name)
+    for other, key in INDEX_KINDS.items():
+        cols = header.setdefault(key, [])
+        if other == kind and col not in cols:
+            cols.append(col)
+        elif other != kind and col in cols:
+            cols.remove(col)
+    save_table_header(table_name, header)
+    index = _build(kind, table_data, col)
+    save_index(table_name, col, index)
+    return index
+
+
+def iter_rows_file(path: str) -> Iterator[dict]:
+    """
+    Stream records from .csv (header row with column names) or .jsonl
+    (one object per line). Values are yielded as strings, ready for
+    cast_value.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in (".csv", ".jsonl"):
+        raise ValueError(f"Некорректное значение: {path}. Попробуйте снова.")
+    with open(path, encoding="utf-8", newline="") as f:
+        if ext == ".csv":
+            yield from csv.DictReader(f)
+            return
+        for line in f:
+            if line.strip():
+                yield {k: str(v) for k, v in json.loads(line).items()}
+
 
+def read_rows_file(path: str) -> list[dict]:
+    """All records of a .csv or .jsonl file (see iter_rows_file)."""
+    return list(iter_rows_file(path))
@@ -0,0 +1,40 @@
+from src.primitive_db.columnar import ColumnarTable
+from src.primitive_db.core import _matcher, compile_predicate, where_candidates
+
+ROWS = [{"ID": i, "name": f"n{i}"} for i in (1, 3, 4, 7)]
+
+
+def test_missing_ids_do_not_force_a_full_scan():
+    assert where_candidates(ROWS, ("ID", "=", 2), None) == []
+    assert where_candidates(ROWS, ("ID", "in", (1, 2, 7, 9)), None) == [0, 3]
+
+
+def test_columnar_masks_match_the_row_predicate():
+    schema = [
+        {"name": "ID", "type": "int"},
+        {"name": "name", "type": "str"},
+        {"name": "age", "type": "int"},
+        {"name": "ok", "type": "bool"},
+    ]
+    rows = [
+        {"ID": i, "name": None if i % 11 == 0 else f"n{i % 5}", "age": i % 40,
+         "ok": i % 3 == 0}
+        for i in range(1, 301)
+    ]
+    columns = ColumnarTable(schema, rows)
+    conditions = [
+        {"name": "n2"},
+        ("age", ">", 30),
+        ("age", "=", 39),
+        ("age", "between", (5, 9)),
+        ("name", "<=", "n1"),
+        ("name", "in", ("n0", "n4", "zz")),
+        ("ok", "=", True),
+        ("and", (("age", "<", 20), ("or", (("name", "=", "n3"), ("ok", "=", False))))),
+        ("not", ("name", ">=", "n2")),
+        ("or", (("ID", "in", (7, 8, 500)), ("not", ("age", "<=", 35)))),
+    ]
+    for where in conditions:
+        match = compile_predicate(where)
+        expected = [i for i, row in enumerate(rows) if match(row)]
+        assert columns.filter(where, _matcher) == expected, where
@@ -0,0 +1,67 @@
+import pytest
+
+from src.primitive_db import engine, utils
+from src.primitive_db.decorators import CONFIRM
+from src.primitive_db.storage import STORAGE_BACKENDS
+
+
+@pytest.fixture(params=sorted(STORAGE_BACKENDS))
+def run(request, tmp_path, monkeypatch, capsys):
+    """Runs a script in a fresh database dir and returns what it printed."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(utils, "STORAGE_BACKEND", request.param)
+    monkeypatch.setattr(utils, "_storage", None)
+    monkeypatch.setattr(engine, "OUTPUT", {"format": "table", "pager": False})
+
+    def script(*lines: str) -> str:
+        capsys.readouterr()
+        engine.run_script(lines)
+        return capsys.readouterr().out
+
+    yield script
+    engine.configure()
+
+
+def test_vacuum_is_refused_inside_transaction(run):
+    run("create_table t name:str", 'insert into t values ("x")')
+    out = run(
+        "begin",
+        'insert into t values ("y")',
+        "vacuum t",
+        "commit",
+        "format jsonl",
+        "select from t",
+    )
+    assert "Команда vacuum недоступна внутри транзакции" in out
+    assert '"name": "x"' in out and '"name": "y"' in out
+
+
+def test_table_output_is_one_grid_across_chunks(run, monkeypatch):
+    monkeypatch.setattr(engine, "PAGE_ROWS", 2)
+    run("create_table t name:str", *[f'insert into t values ("{c}")' for c in "abcde"])
+    lines = run("select from t").splitlines()
+    border = lines[0]
+    assert lines == [
+        border, "| ID | name |", border,
+        *[f"| {i}  |  {c}   |" for i, c in enumerate("abcde", 1)],
+        border,
+    ]
+
+
+def test_ids_are_not_reused_after_the_top_row_is_deleted(run, monkeypatch):
+    monkeypatch.setitem(CONFIRM, "assume_yes", True)
+    run(
+        "create_table t name:str",
+        *[f'insert into t values ("{c}")' for c in "abc"],
+        "delete from t where ID = 3",
+    )
+    # a new session: the sequence comes from the header, not from the rows
+    out = run('insert into t values ("d")', "delete from t where ID = 4")
+    assert "ID=4 успешно добавлена" in out
+    with open("rows.jsonl", "w") as f:
+        f.write('{"name": "e"}\n')
+    run("import rows.jsonl into t")
+    out = run("format jsonl", "select from t")
+    assert [line[:8] for line in out.splitlines()] == [
+        '{"ID": 1', '{"ID": 2', '{"ID": 5'
+    ]